@@ -0,0 +1,48 @@
+'''
+Microbenchmark of vapoursynth RGB24 frame to opencv BGR image conversion,
+old np.dstack() path against BGRConverter (cv2.merge() into preallocated buffer) used by Preview.
+Frames are real vapoursynth frames from core.std.BlankClip(), so no source files are needed.
+
+usage:
+python benchmark_bgr.py [repeat]
+'''
+
+import sys
+import timeit
+
+import vapoursynth as vs
+from vapoursynth import core
+import numpy as np
+
+from view import BGRConverter, isAPI4
+
+RESOLUTIONS = {
+                '1080p': (1920, 1080),
+                '4K':    (3840, 2160),
+                '8K':    (7680, 4320)
+              }
+
+
+def dstack(f):
+    '''
+    conversion that Preview used before BGRConverter
+    '''
+    if isAPI4: return np.dstack([np.asarray(f[p]) for p in [2,1,0]])
+    else:      return np.dstack([np.asarray(f.get_read_array(p)) for p in [2,1,0]])
+
+
+def bench(repeat=50):
+    converter = BGRConverter()
+    print(f'{"":8}{"np.dstack":>14}{"BGRConverter":>16}{"speed up":>12}')
+    for name, (width, height) in RESOLUTIONS.items():
+        clip = core.std.BlankClip(width=width, height=height, format=vs.RGB24, color=[16, 128, 235], length=1)
+        f = clip.get_frame(0)
+        if not np.array_equal(dstack(f), converter.convert(f)):
+            raise RuntimeError(f'[benchmark_bgr] {name}: BGRConverter output differs from np.dstack')
+        old = min(timeit.repeat(lambda: dstack(f), number=1, repeat=repeat))
+        new = min(timeit.repeat(lambda: converter.convert(f), number=1, repeat=repeat))
+        print(f'{name:8}{old*1000:>11.2f} ms{new*1000:>13.2f} ms{old/new:>11.1f}x')
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -7,6 +7,14 @@ import os
 import sys
 import platform
 import timeit
+import time
+import collections
+import threading
+import csv
+import json
+import hashlib
+import abc
+from concurrent.futures import Future, ThreadPoolExecutor
 
 
 import vapoursynth as vs
@@ -31,6 +39,25 @@ except AttributeError:
 RESPECT_X_SUBSAMPLING = True                       #leave both True if wanting snapping to legit cropping values for Vapoursynth based on clip subsampling
 RESPECT_Y_SUBSAMPLING = True                       #user can override these with:  Preview([clip], ignore_subsampling = True)
 
+DISPLAY_CACHE_SHARE = 0.25                         #if display_cache is not given, it is this part of vapoursynth cache size
+HUD_SAMPLES = 60                                   #timing HUD shows mean times of this many last frames
+HUD_REFRESH = 0.25                                 #timing HUD text is updated every HUD_REFRESH seconds
+HUD_STAGES = ['get_frame', 'interleave', 'selection', 'downscale', 'pacing', 'imshow', 'waitKeyEx']
+SCOPES_FPS = 10                                    #scopes are updated at most this many times per second
+SCOPES_WIDTH = 512                                 #frame is decimated to about this many pixels across before computing scopes
+SCOPES_TITLE = 'scopes'
+AUTOTUNE_SAMPLE = 24                               #frames measured for each thread count and depth by run_autotune()
+GOVERNOR_INTERVAL = 1.0                            #seconds between samples of available RAM while preview runs
+GOVERNOR_RESERVE = 512                             #MB of RAM memory governor keeps free, caches shrink if there is less
+GOVERNOR_MIN_CACHE = 100                           #MB, caches together never shrink below this
+BENCHMARK_TITLE = 'benchmark'                      #window for imshow() stage of run_benchmark()
+SLIDER_SETTLE = 0.2                                #slider rests this many seconds, then exact frame is rendered instead of proxy
+WINDOW_POLL = 100                                  #ms, while paused with downscaled image, show loop checks this often if window was resized
+SLIDER_POLL = 50                                   #ms, while paused with slider, show loop checks this often if slider moved
+SLIDER_PROXY_SCALE = 4                             #proxy frames shown while dragging slider are this many times smaller
+SELECTION_FPS = 60                                 #crop selection is redrawn at most this many times per second while dragging
+DIFF_GAIN = 8                                      #difference of clips is amplified this many times in diff mode
+
                                                    #assigning keys '1','2','3',...'9', '0' to rgb clip indexes 0,1,2,..., 8, 9
 CLIP_KEYMAP = [ ord('1'), ord('2'), ord('3'), ord('4'), ord('5'), ord('6'), ord('7'), ord('8') ,ord('9'), ord('0') ]
 
@@ -58,6 +85,14 @@ WINDOWS_KEYMAP =  {
                        27 : 'zoom_out',            #key 'Esc' to go back to previous zoom or crop
                  ord('s') : 'slider_switch',       #key 's' slider on/off, to show slider or to destroy it
                  ord('f') : 'fullscreen_switch',   #key 'f' fullscreen on/off
+                 ord('t') : 'timing_hud',          #key 't' timing HUD on/off
+                 ord('a') : 'selection_stats',     #key 'a' print mean, min, max and stddev of planes for selection or preview area
+                 ord('v') : 'scopes_switch',       #key 'v' scopes window on/off
+                 ord('d') : 'diff_switch',         #key 'd' diff mode on/off, difference of clips with PSNR and SSIM
+                 ord('b') : 'worst_frame',         #key 'b' jump to next worst frame found by Preview.scan()
+                 ord('m') : 'memory_report',       #key 'm' print RAM, caches and prefetch depth, current and given
+                 ord('k') : 'run_autotune',        #key 'k' measure and set best vapoursynth threads and prefetch depth
+                 ord('x') : 'grid_switch',         #key 'x' grid on/off, clips tiled in one window with the same crop or zoom
                  ord('h') : 'help'                 #key 'h' help, shows hotkeys for keybinding
                  
                    }
@@ -89,6 +124,14 @@ LINUX_KEYMAP  =   {
                        27 : 'zoom_out',
                  ord('s') : 'slider_switch',
                  ord('f') : 'fullscreen_switch',
+                 ord('t') : 'timing_hud',
+                 ord('a') : 'selection_stats',
+                 ord('v') : 'scopes_switch',
+                 ord('d') : 'diff_switch',
+                 ord('b') : 'worst_frame',
+                 ord('m') : 'memory_report',
+                 ord('k') : 'run_autotune',
+                 ord('x') : 'grid_switch',
                  ord('h') : 'help'
                       }
         
@@ -115,6 +158,14 @@ DARWIN_KEYMAP  =  {
                        27 : 'zoom_out',
                  ord('s') : 'slider_switch',
                  ord('f') : 'fullscreen_switch',
+                 ord('t') : 'timing_hud',
+                 ord('a') : 'selection_stats',
+                 ord('v') : 'scopes_switch',
+                 ord('d') : 'diff_switch',
+                 ord('b') : 'worst_frame',
+                 ord('m') : 'memory_report',
+                 ord('k') : 'run_autotune',
+                 ord('x') : 'grid_switch',
                  ord('h') : 'help'
                       }
 
@@ -233,8 +284,26 @@ MOUSE LEFT CLICK and MOVE  initiates crop mode, selecting rectangle with mouse,
 'S'  Slider on/off,
      Using slider - grab slider , move it to a frame.
      Seeking is video and vapoursynth source plugin dependant or its argument selection,
-     you could experiance conciderable delay and freeze
+     while dragging, only one small proxy frame is requested at a time, for latest slider position,
+     filter chain still renders full frames, so dragging is as fast as the chain, but requests do not pile up,
+     exact frame is rendered when slider rests
 'F'  Fullscreen on/off switch
+'T'  timing HUD on/off, mean times of preview stages and achieved fps versus target fps,
+     in status bar if opencv has Qt library, otherwise drawn in preview
+'A'  prints mean, min, max and standard deviation of each plane of original clip
+     for selected rectangle, or for whole preview area if there is no selection
+'V'  scopes on/off, luma histogram, waveform, RGB parade and vectorscope of previewed area in separate window,
+     computed in background thread at most 10 times per second
+'D'  diff mode on/off, current clip becomes reference, preview switches to next clip and shows
+     amplified absolute difference to reference, other clips are selected with '1' to '0' as usual,
+     PSNR and SSIM of whole frame are computed in background thread and shown in preview
+'B'  jumps to next worst frame (and its clip) found by Preview.scan(), from the worst one
+'M'  prints available RAM, RAM used by preview, vapoursynth cache, display cache and prefetch depth,
+     current values and values given at start, caches shrink if RAM is running out and grow back later
+'K'  auto-tune, measures throughput of clips for vapoursynth thread counts and prefetch depths on a short sample of frames,
+     best ones are set and measured curve is printed, preview waits until it is done
+'X'  grid on/off, clips are tiled in one window, all with the same crop or zoom, clip under mouse is current clip,
+     crop is selected with mouse outside of grid, grid follows it
 'H'  help, prints this KEYBINDING text
 
 During cropping and just before confirming that crop,
@@ -266,14 +335,23 @@ class Preview:
     --- all crops and zoom show real core.std.CropAbs(), vapoursynth command,  to obtain that crop, or even live feedback during selection
     --- returning back to previous zoom or crop (pressing 'Esc')
     --- writing PNG images to hardisk (what you see, gets saved (with blow-up pixels) or what you see 1:1),
-    --- when writing PNG images during playback it writes subsequent PNG's (for gif creation or other purposes)
+    --- when writing PNG images during playback it writes subsequent PNG's (for gif creation or other purposes),
+        images are written in background threads, so playback timing does not change
+    --- frames are requested ahead of playhead during playback (prefetch), so playback runs at clip's real throughput
+    --- playback can keep real time by dropping frames if filter chain is slower than clip's fps (realtime=True)
+    --- all clips can be rendered at the same time (prefetch_all=True), so switching clips is instant even for slow filter chains
+    --- benchmark of preview pipeline stages, even without a window (headless=True, benchmark=True)
+    --- auto-tune of vapoursynth core.num_threads and prefetch depth for loaded clips (autotune=True or key 'K')
+    --- grid of clips tiled in one window, all with the same crop or zoom (grid=True or key 'X')
     '''
     
     def __init__(self, clips,
                  frames=None, delay = None, img_dir=None, matrix_in_s=None, kernel='Point',
                  mod_x=2, mod_y=2, ignore_subsampling=False,
                  position = (60,60), preview_width = None, preview_height = None,
-                 output_window=False, fullscreen=False, play=False, slider=False):
+                 output_window=False, fullscreen=False, play=False, slider=False, prefetch=None, realtime=False, display_cache=None,
+                 prefetch_all=False, headless=False, benchmark=False, lazy=True, downscale=True, proxy_dir=None, proxy_scale=1,
+                 autotune=False, grid=None):
 
         #setting output print first
         self.validate_boolean(dict(output_window=output_window))
@@ -314,6 +392,18 @@ class Preview:
         self.play                =  play
         self.slider              =  slider
         self.ignore_subsampling  =  ignore_subsampling
+        self.prefetch            =  prefetch
+        self.realtime            =  realtime
+        self.display_cache       =  display_cache
+        self.prefetch_all        =  prefetch_all
+        self.headless            =  headless
+        self.benchmark           =  benchmark
+        self.lazy                =  lazy
+        self.downscale           =  downscale
+        self.proxy_dir           =  proxy_dir
+        self.proxy_scale         =  proxy_scale
+        self.autotune            =  autotune
+        self.grid                =  grid
         try:
             self.validate_clips()
         except ValueError  as err:
@@ -326,68 +416,151 @@ class Preview:
         self.validate_kernel()
         self.validate_position()
         self.validate_preview_dimensions()
-        self.validate_boolean(dict(fullscreen=fullscreen, play=play, slider=slider, ignore_subsampling=ignore_subsampling))
+        self.validate_prefetch()
+        self.validate_display_cache()
+        self.validate_proxy()
+        self.validate_grid()
+        self.validate_boolean(dict(fullscreen=fullscreen, play=play, slider=slider, ignore_subsampling=ignore_subsampling, realtime=realtime,
+                                   prefetch_all=prefetch_all, headless=headless, benchmark=benchmark,
+                                   lazy=lazy, downscale=downscale, autotune=autotune))
 
 
-        #limiting Vapoursynth cache if not enough RAM'''
+        #limiting Vapoursynth cache and display cache if not enough RAM'''
         available = None
         available_RAM = self.freeRAM()
         vapoursynth_cache = core.max_cache_size
+        if self.display_cache is None:
+            self.display_cache = int(vapoursynth_cache * DISPLAY_CACHE_SHARE)
         self.log(f'Vapoursynth cache is set to: {vapoursynth_cache}MB')
         if available_RAM:
             self.log(f'free RAM: {available_RAM}MB')
-            cache = self.limit_cache(vapoursynth_cache, available_RAM)
-            if not cache == vapoursynth_cache:
-                self.log(f'setting Vapoursynth cache to: {cache}MB\n')
-                core.max_cache_size = cache
+            given = vapoursynth_cache + self.display_cache              #both caches share the same RAM
+            total = self.limit_cache(given, available_RAM)
+            if total < given:
+                self.display_cache = int(total * self.display_cache / given)
+                cache = total - self.display_cache
+                if cache < vapoursynth_cache:
+                    self.log(f'setting Vapoursynth cache to: {cache}MB\n')
+                    core.max_cache_size = cache
         else:
             self.log('\nWARNING, failed to get available free RAM,')
             self.log('         Vapoursynth cache was not limited if needed,')
-            self.log('         RAM overrun or freeze possible\n')          
+            self.log('         RAM overrun or freeze possible\n')
+        self.log(f'display cache for rendered preview images is set to: {self.display_cache}MB')
 
 
-        #converting clips to RGB clips for opencv preview
-        self.rgbs           = []               #currently previewing rgb clips
-        self.rgbs_orig      = []               #back ups of original rgb clips
-        self.rgbs_error     = []               #list of booleans, True if rgb had errors
-        convert = Conversions()        
-        depth = 8                              #openCV would scale 16bit int or 32bit float to 0-255 anyway
-        sample_type = vs.INTEGER
-        
-        def error_clip(err):
-            err_clip = core.std.BlankClip(self.clips_orig[i],  format=vs.RGB24)
-            err_clip = core.text.Text(err_clip, err)   
-            self.rgbs.append(err_clip)
-            self.rgbs_error.append(True)
-        
-        for i, clip in enumerate(self.clips_orig):
-            rgb, log = convert.toRGB(clip, matrix_in_s=self.matrix_in_s, depth=depth, kernel=self.kernel, sample_type = sample_type)
-            log = 'clip {} to RGB for preview:\n'.format(i+1) + log
-            
-            try:
-                rgb.get_frame(0)
-            except vs.Error as err:
-                log += '\n[toRGB]'+ str(err)
-                error_clip(err)
-            else:    
-                if isinstance(rgb, vs.VideoNode):
-                    self.rgbs.append(rgb)
-                    self.rgbs_error.append(False)
-                else:
-                    err = '\n[toRGB] converted RGB is not vs.VideoNode'
-                    log += err
-                    error_clip(err)              
-            self.log(log)
+        #rgb clips for opencv preview, clips are converted to RGB only when they are needed first time, see rgb(),
+        #or all of them right away if lazy=False
+        self.rgbs           = [None]*len(self.clips_orig)    #rgb clips, None if not converted yet
+        self.rgbs_orig      = self.rgbs                      #rgb clips of whole frames, cropped ones are made by cropped_rgb()
+        self.rgbs_error     = [None]*len(self.clips_orig)    #list of booleans, True if rgb had errors, None if not converted yet
+        self.rgbs_props     = [None]*len(self.clips_orig)    #frame 0 props of original clips, so cropped clips get the same matrix
                         
         if self.rgbs:     
             self.modx, self.mody, self.modx_subs, self.mody_subs = self.validate_mod(self.modx, self.mody)
-            self.rgbs_orig = self.rgbs.copy() 
-            self.show()
+            if not self.lazy:
+                self.load_rgbs(range(len(self.clips_orig)))
+            self.init_pipeline()
+            if self.autotune:
+                self.run_autotune()
+            if self.benchmark:
+                self.run_benchmark()
+            if not self.headless:
+                self.show()
   
         else:
             self.log('[Preview.__init__] no clips loaded ')
             
                     
+    def rgb(self, i):
+        '''
+        returns rgb clip for preview,
+        clip is converted to RGB and checked first time it is needed (shown, switched to, prefetched, exported),
+        so time to first frame does not depend on number of clips,
+        if clip is being converted in background (see load_rgb_background()), it waits for it
+        '''
+        if self.rgbs_error[i] is None:
+            loading = self.loading.pop(i, None)
+            if loading is not None:
+                loading.result()
+            else:
+                self.load_rgbs([i])
+        return self.rgbs[i]
+
+    def load_rgb_background(self, i):
+        '''
+        converts and checks clip i in loader thread, so show loop is not stalled by it,
+        rgb(i) is ready when rgbs_error[i] is not None
+        '''
+        if i not in self.loading:
+            self.loading[i] = self.loader.submit(self.load_rgbs, [i])
+
+    def load_rgbs(self, indexes):
+        '''
+        converting clips to RGB clips for opencv preview and checking them by requesting frame 0,
+        requests for all clips run at the same time, so it takes as long as the slowest clip, not all of them together,
+        frame 0 of a source clip is requested once and its props are used to get matrix for RGB conversion,
+        if conversion fails, rgb is a clip with error text
+        '''
+        depth = 8                              #openCV would scale 16bit int or 32bit float to 0-255 anyway
+        sample_type = vs.INTEGER
+        
+        def error_clip(i, err):
+            err_clip = core.std.BlankClip(self.clips_orig[i],  format=vs.RGB24)
+            err_clip = core.text.Text(err_clip, str(err))
+            self.rgbs[i] = err_clip
+            self.rgbs_error[i] = True
+
+        sources = {i: get_frame_async(self.clips_orig[i], 0) for i in indexes}
+        logs = {}
+        checks = {}
+        for i, future in sources.items():
+            try:
+                props = dict(future.result().props)
+            except vs.Error:
+                props = {}                     #error is logged while checking rgb
+            self.rgbs_props[i] = props
+            rgb, log = Conversions().toRGB(self.clips_orig[i], matrix_in_s=self.matrix_in_s, depth=depth, kernel=self.kernel,
+                                           sample_type = sample_type, props=props)
+            logs[i] = 'clip {} to RGB for preview:\n'.format(i+1) + log
+            if isinstance(rgb, vs.VideoNode):
+                self.rgbs[i] = rgb
+                checks[i] = get_frame_async(rgb, 0)
+            else:
+                err = '\n[toRGB] converted RGB is not vs.VideoNode'
+                logs[i] += err
+                error_clip(i, err)
+        for i, future in checks.items():
+            try:
+                future.result()
+            except vs.Error as err:
+                logs[i] += '\n[toRGB]'+ str(err)
+                error_clip(i, err)
+            else:
+                self.rgbs_error[i] = False
+        for i in sources:
+            self.log(logs[i])
+
+    def init_pipeline(self):
+        '''
+        objects that get frames from vapoursynth to numpy images, used by show(), run_benchmark() and export()
+        '''
+        self.previewData_reset()
+        self.prefetchers = [Prefetcher(self.prefetch) for clip in self.clips_orig]  #read-ahead of frames during playback, one for each clip
+        self.loader = ThreadPoolExecutor(max_workers=1)                    #converting clips to RGB in background, see load_rgb_background()
+        self.loading = {}                                                  #{clip index: future} clips being converted by loader
+        self.converter = BGRConverter()                                    #vapoursynth RGB frame to numpy BGR for opencv
+        self.cache = FrameCache(self.display_cache)                        #already rendered BGR images
+        self.img_key = None                                                #cache key of image on screen, full_img
+        self.crop_rgbs = {}                                                #{(clip index, crop): rgb clip of cropped source or None}
+        self.proxies = [None]*len(self.clips_orig)                         #ProxyStore for each clip if proxy_dir is given
+        self.fingerprints = {}                                             #{clip index: future of frame for proxy store name}
+        self.src = None                                                    #(clip, frame number, vs.VideoFrame) last source frame, see source_frame()
+        self.writer = ImageWriter(log=self.log)                            #writing PNG's in background
+        self.worst_frames = []                                             #[(frame, clip index, psnr, ssim, max diff), ...] from scan()
+        self.worst_index = -1
+        self.governor = None                                               #MemoryGovernor while show() runs
+
     def show(self):
         '''
         setting up show loop
@@ -409,13 +582,27 @@ class Preview:
         else:            self.play  = 0
         self.previewData_reset()                        #makes first stored crop data (width, height, left, top)
         
-        self.width  = self.rgbs_orig[self.i].width
-        self.height = self.rgbs_orig[self.i].height
+        self.width  = self.clips_orig[self.i].width
+        self.height = self.clips_orig[self.i].height
         self.left   = 0
         self.top    = 0
         
         #mouseAction() properties
         self.ix, self.iy = (-1 , -1)     #assuming mouse off preview area so no readings yet
+        self.overlay = SelectionOverlay() #preview image with selection, recomposed only where selection changed
+        self.img_serial = 0              #changes with shown image, so overlay knows when to start over
+        self.img_id = None
+        self.selection_drawn = 0         #time when selection was drawn last time while dragging
+        self.selection_dirty = False     #selection moved, but it was not drawn yet
+        self.display_buffer = None       #downscaled image for imshow() if window is smaller than image, see display_img()
+        self.display_scale = None        #(x, y) scale of image on screen to shown image if downscaled, for mouse coordinates
+        self.display_size = None         #window (width, height) that image was downscaled for
+        self.seeking = False             #slider is dragged while paused, proxy frames are shown, see seek_frame()
+        self.slider_moved = 0
+        self.proxy_request = None        #(frame number, future) only one proxy frame is requested at a time
+        self.proxy_shown = None          #frame number of proxy on screen
+        self.proxy_rgbs = {}             #{clip index: downscaled rgb clip}
+        self.proxy_converter = BGRConverter()
         self.tx, self.ty = (-10,-10)     #first touchdown coordinates while drawing rectangle
         self.isCropping = False          #initiates cropping
         self.drawing = False             #True after left mouse button clicks so cropping drawing animation is activated
@@ -431,9 +618,9 @@ class Preview:
           
         #opencv window
         text=''
-        for i , rgb in enumerate(self.rgbs):
-            text +='clip{} {}    '.format(i+1, self.clips_orig[i].format.name)
-        clip_KEYMAP = CLIP_KEYMAP[:len(self.rgbs)]
+        for i , clip in enumerate(self.clips_orig):
+            text +='clip{} {}    '.format(i+1, clip.format.name)
+        clip_KEYMAP = CLIP_KEYMAP[:len(self.clips_orig)]
         
         self.title = 'VideoNodes:   {}'.format(text)
         self.build_window(self.title, self.mouseAction)
@@ -458,17 +645,42 @@ class Preview:
         #init print  
         self.print_info(self.print_clip_name() +': {}'.format(self.i+1))
 
-        if self.play: self.ref = timeit.default_timer()                    #starting time reference for timing frames
+        self.pacer = FramePacer(self.delay, self.realtime)                 #timing frames for playback
+        if self.play: self.pacer.start()                                   #starting time reference for timing frames
+        self.hud = False                                                   #timing HUD, toggled by key 't'
+        self.timer = StageTimer(HUD_SAMPLES)
+        self.hud_shown = collections.deque(maxlen=HUD_SAMPLES)             #times when frames were shown, for fps
+        self.hud_text = []
+        self.hud_updated = 0
+        self.scopes = None                                                 #Scopes object if scopes are on, toggled by key 'v'
+        self.governor = None                                               #shrinks caches and prefetch if RAM is running out
+        if self.freeRAM():
+            self.governor = MemoryGovernor(self.freeRAM, core.max_cache_size, self.display_cache, self.prefetch)
+        self.diff_ref = None                                               #index of reference clip in diff mode, toggled by key 'd'
+        if self.grid_on and len({self.resolutions[i] for i in self.grid}) > 1:
+            self.log('grid needs clips with the same resolution, grid is off')
+            self.grid_on = False
+        self.grid_canvas = None                                            #preallocated image with all tiles, see grid_image()
+        self.grid_key = None                                               #(frame, crop, clips) of canvas
+        self.grid_layout = None                                            #(columns, tile width, tile height)
+        self.grid_slots = {}                                               #{clip index: tile view into canvas}
+        self.grid_converter = BGRConverter()
         
         '''
         main openCV playback loop
         '''
+        idle = False
         while True:
             
-            self.show_frame()
-            if self.slider:
-                cv2.setTrackbarPos('Frames', self.title, self.frame)
-            key = cv2.waitKeyEx(self.play)
+            if not idle:
+                self.show_frame()
+                if self.slider:
+                    cv2.setTrackbarPos('Frames', self.title, self.frame)
+            wait = self.play or self.background_wait()
+            key = cv2.waitKeyEx(wait or (SLIDER_POLL if self.slider else WINDOW_POLL if self.display_scale else 0))   #slider callback does not end waitKeyEx(0)
+            idle = key == -1 and not self.play and not self.background_wait() and not self.window_resized()   #nothing changed, no need to show frame again
+            if self.hud: self.timer.lap('waitKeyEx')
+            if self.governor: self.govern()
             #print(key)
             if key != -1:                                                  #if a key was pressed
                 try:
@@ -492,11 +704,145 @@ class Preview:
             if cv2.getWindowProperty(self.title, cv2.WND_PROP_VISIBLE) < 1:   #canceling window clicking 'x'
                  break
 
+        self.stop_workers()
+        self.writer.flush()
+        self.flush_proxies()
         cv2.destroyAllWindows()
         
+    def run_benchmark(self, crop=None):
+        '''
+        runs the same pipeline as show() for all clips over frames, in its own window (none if headless=True),
+        and logs fps, peak RAM and latency of each stage (mean, 95th and 99th percentile):
+        filter     - waiting for frame of original clip, that is filter chain, frames are requested ahead with prefetch
+                     as during playback, so it is what filter chain costs on top of what prefetch could hide
+        toRGB      - requesting frame from rgb clip, conversion for preview (source frame is already in vapoursynth cache)
+        interleave - vapoursynth RGB planes to numpy BGR image
+        compose    - crop or zoom of that image made contiguous for imshow(), only if crop [width, height, left, top] is given
+        downscale  - resizing to preview_width x preview_height as display_img() does, only if preview is smaller than clip
+        imshow     - imshow() and waitKey(1) that paints it, headless benchmark cannot measure it, it is not in report then
+        fps is playback throughput with prefetch.
+        Results are also stored in self.benchmark_report, list of dictionaries, one for each clip.
+        '''
+        self.previewData_reset()
+        if crop is not None:
+            self.validate_crop(*crop)
+            self.previewData.append(list(crop))
+        self.benchmark_report = []
+        count = self.frames[1] - self.frames[0]
+        for i in range(len(self.rgbs)):
+            rgb = self.rgb(i)
+            source = self.clips_orig[i]
+            prefetcher = Prefetcher(self.prefetch)
+            timer = StageTimer()
+            peak = self.processRAM()
+            display_buffer = None
+            start = timeit.default_timer()
+            try:
+                for n in range(*self.frames):
+                    timer.start()
+                    prefetcher.get_frame(source, n, self.frames[1])
+                    timer.lap('filter')
+                    f = rgb.get_frame(n)
+                    timer.lap('toRGB')
+                    img = self.converter.convert(f)
+                    timer.lap('interleave')
+                    if crop is not None:
+                        img = np.ascontiguousarray(self.crop_view(img))
+                        timer.lap('compose')
+                    height, width = img.shape[:2]
+                    w, h = min(width, self.init_preview_width), min(height, self.init_preview_height)
+                    if (w, h) != (width, height):
+                        if display_buffer is None:
+                            display_buffer = np.empty((h, w, 3), np.uint8)
+                        img = cv2.resize(img, (w, h), dst=display_buffer, interpolation=cv2.INTER_LINEAR)
+                        timer.lap('downscale')
+                    if not self.headless:
+                        cv2.imshow(BENCHMARK_TITLE, img)
+                        cv2.waitKey(1)
+                        timer.lap('imshow')
+                    if peak is not None:
+                        peak = max(peak, self.processRAM())
+            except vs.Error as err:
+                self.log(f'[Preview.benchmark] clip{i+1} frame {n} failed: {err}')
+                continue
+            elapsed = timeit.default_timer() - start
+            if peak is None:
+                peak = self.peakRAM()
+            report = dict(clip=i+1, frames=count, fps=count/elapsed, peak_RAM=peak, stages=timer.stats())
+            self.benchmark_report.append(report)
+            self.log(f'\n[Preview.benchmark] clip{i+1} {self.clips_orig[i].format.name}, frames {self.frames[0]} to {self.frames[1]-1}, '
+                     f'prefetch {self.prefetch}')
+            self.log(f'  fps: {report["fps"]:.2f}   peak RAM: {peak}MB')
+            self.log(timer.report())
+            if self.headless:
+                self.log('  imshow is not measured without window (headless=True), timing HUD (key "T") shows it during preview')
+        if not self.headless:
+            cv2.destroyWindow(BENCHMARK_TITLE)
+        self.previewData_reset()
+
+    def run_autotune(self, frames=None, clips=None, threads=None, depths=None, sample=AUTOTUNE_SAMPLE):
+        '''
+        measures throughput (fps) of rgb clips for vapoursynth thread counts and for numbers of frames requested ahead (depth),
+        best ones are set as core.num_threads and prefetch depth, measured curve is logged.
+        Threads are measured first with depth equal to threads (default prefetch), then depths with best thread count.
+        Each measurement requests its own "sample" frames, so vapoursynth cache does not help next ones,
+        if frames range is too short, frames are used again and results are less reliable.
+        frames     list with first frame and last frame+1, default is Preview's frames
+        clips      list of clip indexes, default is all clips, they are measured one after another as preview shows them
+        threads    thread counts to try, default is powers of two up to number of CPU's and number of CPU's
+        depths     prefetch depths to try, default is powers of two up to twice the best thread count
+        Results are also stored in self.autotune_report, list of dictionaries.
+        '''
+        frames = frames or self.frames
+        clips = list(range(len(self.clips_orig))) if clips is None else list(clips)
+        cpus = os.cpu_count() or 1
+        if threads is None:
+            threads = sorted({1 << p for p in range(cpus.bit_length()) if 1 << p <= cpus} | {cpus})
+        rgbs = [self.rgb(i) for i in clips]
+        span = frames[1] - frames[0]
+        start_frame = frames[0]
+        def measure(count, depth, report=True):
+            nonlocal start_frame
+            core.num_threads = count
+            ns = [frames[0] + (start_frame - frames[0] + k) % span for k in range(min(sample, span))]
+            start_frame = ns[-1] + 1
+            start = timeit.default_timer()
+            for rgb in rgbs:
+                for n, future in request_frames(((rgb, n) for n in ns), depth):
+                    future.result()
+            fps = len(ns)*len(rgbs)/(timeit.default_timer() - start)
+            if not report:
+                return fps
+            self.autotune_report.append(dict(threads=count, depth=depth, fps=fps))
+            self.log(f'  threads: {count:>3}   depth: {depth:>3}   fps: {fps:8.2f}')
+            return fps
+
+        self.log(f'\n[Preview.autotune] clips: {", ".join(f"clip{i+1}" for i in clips)}, {sample} frames for each measurement')
+        if span < sample*(len(threads) + 6):
+            self.log(f'[Preview.autotune] WARNING, only {span} frames to measure, frames are used again, vapoursynth cache can skew results')
+        given_threads, given_prefetch = core.num_threads, self.prefetch
+        self.autotune_report = []
+        try:
+            measure(max(threads), max(threads), report=False)             #warm up, filters get initialized, not counted
+            best_threads = max(threads, key=lambda count: measure(count, count))
+            if depths is None:
+                depths = [1 << p for p in range((2*best_threads).bit_length())]
+            best_depth = max(depths, key=lambda depth: measure(best_threads, depth))
+        except vs.Error as err:
+            core.num_threads = given_threads
+            self.log(f'[Preview.autotune] failed, threads and prefetch are not changed: {err}')
+            return
+        core.num_threads = best_threads
+        self.prefetch = best_depth
+        self.prefetchers = [Prefetcher(best_depth) for clip in self.clips_orig]
+        if self.governor:
+            self.governor.set_prefetch(best_depth)
+        self.log(f'[Preview.autotune] core.num_threads set to: {best_threads}, prefetch set to: {best_depth} '
+                 f'(given were {given_threads} and {given_prefetch})')
+
     def update_frame(self, f):    
         if self.play :
-            f += 1
+            f += 1 + self.pacer.skip()                                     #skipping frames only if realtime=True and late
         if f >= self.frames[1]:
             self.play  = 0
             f = self.frames[1]-1
@@ -507,23 +853,478 @@ class Preview:
         
     def show_frame(self):
         '''
-        Vapoursynth frame is converted  to numpy arrays for opencv to show
+        Vapoursynth frame is converted  to numpy arrays for opencv to show,
+        rendered images are cached, so showing the same frame again (same clip) is just a lookup,
+        crop or zoom is just a numpy view into full image, so it does not need any new vapoursynth work
         delay is handled here, not in cv2.waitKey() because timeit.default_timer() takes app&system  time overhead into an account
         '''
-        
-        try: 
-            f = self.rgbs[self.i].get_frame(self.frame)
-        except:       
-            f = self.error_frame()                          
-        if isAPI4: self.img = np.dstack([np.array(f[p], copy=False) for p in [2,1,0]])
-        else:      self.img = np.dstack([np.array(f.get_read_array(p), copy=False) for p in [2,1,0]])
+        if self.hud: self.timer.start()
+        if self.seeking and self.seek_frame():
+            return
+        if self.grid_on:
+            self.img = self.grid_image()
+            self.img_id = (self.img_serial, 'grid', tuple(self.previewData[-1]))
+        else:
+            full_key = (self.i, self.frame, tuple(self.previewData[0]))
+            crop = self.source_crop(self.i)
+            key = (self.i, self.frame, crop)
+            if key != full_key and key != self.img_key and key not in self.cache and full_key in self.cache:
+                key = full_key                                                 #whole frame is rendered already, crop is just a view
+            if key != self.img_key:
+                self.img_serial += 1
+                self.full_img = self.cache.get(key)
+                if self.full_img is None and key == full_key:
+                    self.full_img = self.stored_img(self.i, self.frame)          #rendered in previous runs or earlier in this one
+                self.img_key = key
+                if self.full_img is None:
+                    try: 
+                        node = self.rgb(self.i) if key == full_key else self.crop_rgbs[(self.i, crop)]
+                        f = self.prefetchers[self.i].get_frame(node, self.frame, self.frames[1], ahead=self.play)
+                    except:
+                        self.prefetchers[self.i].reset()
+                        self.full_img = self.converter.convert(self.error_frame())
+                        self.img_key = None
+                    else:
+                        if self.hud: self.timer.lap('get_frame')
+                        self.full_img = self.converter.convert(f)
+                        owned = self.cache.put(key, self.full_img)
+                        if key == full_key and self.proxy_store(self.i):
+                            self.proxies[self.i].put(self.frame, self.full_img)     #written in background
+                            owned = True
+                        if owned:
+                            self.converter.detach()                     #image belongs to cache or proxy store now
+                        if self.hud: self.timer.lap('interleave')
+            diff_key = None
+            if self.diff_ref is not None and self.diff_ref != self.i and self.img_key is not None:
+                self.img = self.crop_view(self.diff_image())
+                diff_key = self.diff_key
+            elif self.img_key is not None and self.img_key != full_key:
+                self.img = self.full_img                                       #rendered from cropped source
+            else:
+                self.img = self.crop_view(self.full_img)
+            self.img_id = None if self.img_key is None else (self.img_serial, diff_key, tuple(self.previewData[-1]))
+        img = self.img
+        if self.selection_dirty:
+            self.selection_dirty = False
+            self.live_crop_info((self.x1,self.y1,self.x2,self.y2))
         if self.isCropping and self.x1 is not None:
             img = self.img_and_selection(self.img, (self.x1,self.y1,self.x2,self.y2),self.color)
-            if self.play: self.delay_it()
-            cv2.imshow(self.title, img)
+            if self.hud: self.timer.lap('selection')
+        img = self.display_img(img)
+        if self.hud and self.display_scale: self.timer.lap('downscale')
+        if self.diff_ref is not None and self.diff_ref != self.i:
+            img = self.diff_text(img)
+        if self.play: self.delay_it()
+        if self.hud:
+            self.timer.lap('pacing')
+            img = self.hud_image(img)
+        cv2.imshow(self.title, img)
+        if self.hud:
+            self.timer.lap('imshow')
+            self.hud_shown.append(self.timer.t)
+        if self.prefetch_all and not self.grid_on:
+            self.prefetch_other_clips()
+        if self.scopes:
+            self.update_scopes()
+
+    def display_img(self, img):
+        '''
+        if window is smaller than image, image is downscaled with one cv2.resize() into reused buffer,
+        so imshow() moves only what is visible instead of full 4K or 8K image,
+        not while zoomed, cropped or selecting crop, so then preview is always pixel exact
+        '''
+        self.display_scale = None
+        self.display_size = None
+        if not self.downscale or len(self.previewData) > 1 or self.isCropping:
+            return img
+        try:
+            _, _, w, h = cv2.getWindowImageRect(self.title)
+        except cv2.error:
+            return img
+        self.display_size = (w, h)
+        height, width = img.shape[:2]
+        if w <= 0 or h <= 0 or (w >= width and h >= height):
+            return img
+        w, h = min(w, width), min(h, height)
+        if self.display_buffer is None or self.display_buffer.shape[:2] != (h, w):
+            self.display_buffer = np.empty((h, w, 3), np.uint8)
+        cv2.resize(img, (w, h), dst=self.display_buffer, interpolation=cv2.INTER_LINEAR)   #INTER_AREA is several times slower
+        self.display_scale = (width/w, height/h)
+        return self.display_buffer
+
+    def window_resized(self):
+        '''
+        True if window was resized (or made fullscreen) since image was downscaled for it, so it has to be downscaled again
+        '''
+        if self.display_scale is None:
+            return False
+        try:
+            return tuple(cv2.getWindowImageRect(self.title)[2:]) != self.display_size
+        except cv2.error:
+            return False
+
+    def scopes_switch(self):
+        if self.scopes:
+            self.scopes.stop()
+            self.scopes = None
+            cv2.destroyWindow(SCOPES_TITLE)
+            return
+        self.scopes = Scopes(SCOPES_FPS, SCOPES_WIDTH)
+        cv2.namedWindow(SCOPES_TITLE)
+        x, y, w, _ = cv2.getWindowImageRect(self.title)
+        cv2.moveWindow(SCOPES_TITLE, x + w + 10, y)
+        self.update_scopes()
+
+    def update_scopes(self):
+        '''
+        hands previewed area to scopes thread if it is not busy and shows scopes that are ready, never waits for scopes
+        '''
+        key = (self.i, self.frame, tuple(self.previewData[-1]))
+        if self.scopes.wants(key):
+            img = self.grid_slots.get(self.i, self.img) if self.grid_on else self.img
+            self.scopes.submit(key, self.clips_orig[self.i], self.frame, self.previewData[-1], img)
+        canvas = self.scopes.result()
+        if canvas is not None:
+            cv2.imshow(SCOPES_TITLE, canvas)
+
+    def background_wait(self):
+        '''
+        while paused, show loop waits for a key forever, but if scopes or diff metrics are not shown for current frame yet,
+        loop has to come back to show them
+        '''
+        if self.scopes and self.scopes.pending((self.i, self.frame, tuple(self.previewData[-1]))):
+            return max(1, int(500/SCOPES_FPS))
+        if self.diff_ref is not None and self.diff_ref != self.i and self.diff_key is not None and self.metrics.pending(self.diff_key):
+            return 50
+        if self.selection_dirty:
+            return max(1, int(1000/SELECTION_FPS))
+        if self.seeking:
+            return max(1, int(1000*SLIDER_SETTLE/4))
+        return 0
+
+    def diff_switch(self):
+        '''
+        current clip becomes reference, preview switches to next clip
+        '''
+        if self.diff_ref is not None:
+            self.metrics.stop()
+            self.diff_ref = None
+            self.print_info('diff mode off')
+            return
+        if self.grid_on:
+            self.print_info('diff mode is not available in grid, press "X" to turn grid off')
+            return
+        if len(self.clips_orig) < 2:
+            self.print_info('diff mode needs at least two clips')
+            return
+        if len(set(self.resolutions)) > 1:
+            self.print_info('diff mode needs clips with the same resolution')
+            return
+        self.diff_ref = self.i
+        self.i = (self.i + 1) % len(self.clips_orig)
+        self.diff_converter = BGRConverter()                               #reference clip has its own buffer, current image stays valid
+        self.diff_key = None                                               #(img_key, reference img_key) of diff image
+        self.diff_values = None                                            #(diff_key, psnr, ssim) last metrics
+        self.diff_error = None                                             #ref_key of reference frame that failed, it is not requested again
+        self.metrics = FrameMetrics()
+        self.print_info(f'diff mode, clip{self.i+1} against reference clip{self.diff_ref+1}, gain {DIFF_GAIN}x')
+
+    def diff_image(self):
+        '''
+        amplified absolute difference of current image and reference clip image,
+        reference image is rendered and cached the same way as current image,
+        both images are handed over to metrics thread if it is idle,
+        if reference frame fails, current image is shown as it is and that frame is not requested again
+        '''
+        ref_key = (self.diff_ref, self.frame, tuple(self.previewData[0]))
+        key = (self.img_key, ref_key)
+        if key == self.diff_key:
+            return self.diff_img
+        if ref_key == self.diff_error:
+            return self.full_img
+        ref = self.cache.get(ref_key)
+        if ref is None:
+            ref = self.stored_img(self.diff_ref, self.frame)
+        if ref is None:
+            try:
+                f = self.prefetchers[self.diff_ref].get_frame(self.rgb(self.diff_ref), self.frame, self.frames[1], ahead=self.play)
+            except Exception as err:
+                self.prefetchers[self.diff_ref].reset()
+                self.log(f'[Preview.diff] reference clip{self.diff_ref+1} frame {self.frame} could not be rendered: {err}')
+                self.diff_error = ref_key
+                self.diff_key = None
+                return self.full_img
+            ref = self.diff_converter.convert(f)
+            if self.cache.put(ref_key, ref):
+                self.diff_converter.detach()
+        self.diff_key = key
+        self.diff_img = cv2.convertScaleAbs(cv2.absdiff(self.full_img, ref), alpha=DIFF_GAIN)
+        if self.metrics.wants(key):
+            if self.full_img is self.converter.buffer: self.converter.detach()       #metrics thread owns images now
+            if ref is self.diff_converter.buffer: self.diff_converter.detach()
+            self.metrics.submit(key, self.full_img, ref)
+        return self.diff_img
+
+    def diff_text(self, img):
+        '''
+        draws clip numbers and PSNR, SSIM of current frame into a copy of image
+        '''
+        values = self.metrics.result()
+        if values is not None:
+            self.diff_values = (self.metrics.key,) + values
+            if not self.play:
+                self.print_info(f'clip{self.i+1} vs clip{self.diff_ref+1} frame {self.frame}: PSNR {values[0]:.2f} dB  SSIM {values[1]:.4f}')
+        text = f'|clip{self.i+1} - clip{self.diff_ref+1}| x{DIFF_GAIN}'
+        if self.diff_values:
+            key, psnr_value, ssim_value = self.diff_values
+            text += f'   PSNR {psnr_value:.2f} dB   SSIM {ssim_value:.4f}'
+            if key != self.diff_key:
+                text += f'   (frame {key[0][1]})'                     #metrics are behind during playback
+        img = img.copy()
+        scale = max(0.35, img.shape[1]/2400)
+        position = (int(15*scale)+1, img.shape[0] - int(15*scale) - 1)
+        cv2.putText(img, text, position, cv2.FONT_HERSHEY_SIMPLEX, scale, (0,0,0), 3, cv2.LINE_AA)
+        cv2.putText(img, text, position, cv2.FONT_HERSHEY_SIMPLEX, scale, (255,255,255), 1, cv2.LINE_AA)
+        return img
+
+    def grid_switch(self):
+        '''
+        clips in self.grid are tiled in one window, see grid_image()
+        '''
+        if self.grid_on:
+            self.grid_on = False
+            self.print_info(f'grid off, {self.print_clip_name()}: {self.i+1}')
+            return
+        if self.diff_ref is not None:
+            self.print_info('grid is not available in diff mode, press "D" to turn diff mode off')
+            return
+        if len({self.resolutions[i] for i in self.grid}) > 1:
+            self.print_info('grid needs clips with the same resolution')
+            return
+        self.isCropping = False
+        self.x1 = None
+        self.grid_on = True
+        self.grid_key = None
+        self.print_info(f'grid of clips: {", ".join(str(i+1) for i in self.grid)}')
+
+    def grid_image(self):
+        '''
+        clips in self.grid are tiled in one canvas, left to right and top to bottom, all with the same crop or zoom,
+        frames of all tiles are requested first and taken afterwards, so vapoursynth renders them concurrently,
+        each frame is converted straight into its slot of canvas, canvas is allocated again only if tile size or layout changes,
+        tiles in display cache or proxy store are just copied into their slots, rendered tiles are put into display cache too
+        '''
+        width, height = self.preview_size()
+        cols = int(np.ceil(np.sqrt(len(self.grid))))
+        rows = -(-len(self.grid) // cols)
+        shape = (rows*height, cols*width, 3)
+        if self.grid_canvas is None or self.grid_canvas.shape != shape:
+            self.grid_canvas = np.zeros(shape, np.uint8)
+            self.grid_key = None
+            self.grid_layout = (cols, width, height)
+            self.grid_slots = {}
+            for t, i in enumerate(self.grid):
+                y, x = divmod(t, cols)
+                self.grid_slots[i] = self.grid_canvas[y*height:(y+1)*height, x*width:(x+1)*width]
+        grid_key = (self.frame, tuple(self.previewData[-1]), tuple(self.grid))
+        if grid_key == self.grid_key:
+            return self.grid_canvas
+        self.img_serial += 1
+        full_crop = tuple(self.previewData[0])
+        pending = []
+        for i in self.grid:                                           #requesting frames of all tiles, not waiting for them
+            crop = self.source_crop(i)
+            key, full_key = (i, self.frame, crop), (i, self.frame, full_crop)
+            if key != full_key and key not in self.cache and full_key in self.cache:
+                key = full_key
+            img = self.cache.get(key)
+            if img is None and key == full_key:
+                img = self.stored_img(i, self.frame)
+            if img is not None:
+                self.grid_slots[i][:] = self.crop_view(img) if key == full_key else img
+                continue
+            try:
+                node = self.rgb(i) if key == full_key else self.crop_rgbs[(i, crop)]
+                self.prefetchers[i].prefetch(node, self.frame, self.frames[1], ahead=self.play)
+            except:
+                node = None
+            pending.append((i, key, node))
+        complete = True
+        for i, key, node in pending:
+            slot = self.grid_slots[i]
+            try:
+                f = self.prefetchers[i].get_frame(node, self.frame, self.frames[1], ahead=self.play)
+            except:
+                self.prefetchers[i].reset()
+                self.log(f'[Preview.grid] clip{i+1} frame {self.frame} could not be rendered')
+                slot[:] = 0
+                complete = False
+                continue
+            if key[2] == full_crop and len(self.previewData) > 1:    #zoomed, but whole frame was rendered
+                img = self.grid_converter.convert(f)
+                slot[:] = self.crop_view(img)
+            else:
+                img = self.grid_converter.convert(f, out=slot).copy()  #canvas is reused, so leaving grid does not render tiles again
+            owned = self.cache.put(key, img)
+            if key[2] == full_crop and self.proxy_store(i):
+                self.proxies[i].put(self.frame, img)
+                owned = True
+            if owned and img is self.grid_converter.buffer:
+                self.grid_converter.detach()
+        scale = max(0.35, width/1200)
+        for i, slot in self.grid_slots.items():
+            position = (int(15*scale)+1, int(30*scale)+1)
+            cv2.putText(slot, f'clip{i+1}', position, cv2.FONT_HERSHEY_SIMPLEX, scale, (0,0,0), 3, cv2.LINE_AA)
+            cv2.putText(slot, f'clip{i+1}', position, cv2.FONT_HERSHEY_SIMPLEX, scale, (255,255,255), 1, cv2.LINE_AA)
+        self.grid_key = grid_key if complete else None
+        return self.grid_canvas
+
+    def govern(self):
+        '''
+        display cache and prefetch depth are not thread safe, so new limits from memory governor are set here, in show loop
+        '''
+        change = self.governor.take()
+        if change is None:
+            return
+        display_cache, prefetch = change
+        self.cache.set_budget(display_cache)
+        for prefetcher in self.prefetchers:
+            prefetcher.depth = prefetch
+        self.log(f'[MemoryGovernor] available RAM {self.governor.avail}MB, vapoursynth cache: {core.max_cache_size}MB, '
+                 f'display cache: {display_cache}MB, prefetch: {prefetch}')
+
+    def memory_report(self):
+        MB = 1024*1024
+        vs_cache, display_cache, prefetch = self.governor.given if self.governor else (core.max_cache_size, self.display_cache, self.prefetch)
+        info = [f'available RAM: {self.freeRAM()}MB', f'  RAM used by preview: {self.processRAM() or self.peakRAM()}MB',
+                f'  vapoursynth cache: {core.max_cache_size}MB of {vs_cache}MB given',
+                f'  display cache: {self.cache.size/MB:.0f}MB used, {self.cache.budget/MB:.0f}MB of {display_cache}MB given, '
+                f'{len(self.cache.images)} images',
+                f'  prefetch depth: {self.prefetchers[self.i].depth} of {prefetch} given']
+        if self.governor:
+            info.append(f'  memory governor keeps {self.governor.reserve}MB free, limits changed {self.governor.changes} times')
         else:
-            if self.play: self.delay_it()
-            cv2.imshow(self.title, self.img)
+            info.append('  no memory governor, available RAM cannot be read')
+        self.log('\n'.join(info))
+        if self.Qt:
+            self.print_statusBar('  '.join(' '.join(line.split()) for line in info))
+
+    def timing_hud(self):
+        self.hud = not self.hud
+        self.timer = StageTimer(HUD_SAMPLES)
+        self.hud_shown.clear()
+        self.hud_text = []
+        if not self.hud:
+            self.print_info('timing HUD off')
+            self.show_frame()
+
+    def hud_image(self, img):
+        '''
+        timing HUD, text is refreshed every HUD_REFRESH seconds,
+        it goes to status bar if opencv has Qt, otherwise it is drawn into a copy of image
+        get_frame is filter chain and toRGB conversion together, waiting for prefetched frame,
+        get_frame and interleave are not timed if image came from cache
+        '''
+        now = timeit.default_timer()
+        if now - self.hud_updated > HUD_REFRESH:
+            self.hud_updated = now
+            stats = self.timer.stats()
+            self.hud_text = [f'{stage: <11}{stats[stage][0]*1000:>7.2f} ms' for stage in HUD_STAGES if stage in stats]
+            if len(self.hud_shown) > 1:
+                fps = (len(self.hud_shown)-1)/(self.hud_shown[-1] - self.hud_shown[0])
+                self.hud_text.append(f'fps {fps:.2f} / {1/self.delay:.2f}' if self.delay else f'fps {fps:.2f}')   #delay=0 has no target
+            if self.pacer.dropped or self.pacer.late:
+                self.hud_text.append(f'dropped {self.pacer.dropped} late {self.pacer.late}')
+            if self.Qt:
+                self.print_statusBar('  '.join(' '.join(line.split()) for line in self.hud_text))
+        if self.Qt:
+            return img
+        img = img.copy()
+        scale = max(0.35, img.shape[1]/2400)
+        step = int(30*scale)+2
+        for row, line in enumerate(self.hud_text):
+            position = (step//2, step*(row+1))
+            cv2.putText(img, line, position, cv2.FONT_HERSHEY_SIMPLEX, scale, (0,0,0), 3, cv2.LINE_AA)
+            cv2.putText(img, line, position, cv2.FONT_HERSHEY_SIMPLEX, scale, (255,255,255), 1, cv2.LINE_AA)
+        return img
+            
+    def source_crop(self, i):
+        '''
+        returns crop (width, height, left, top) that image of clip i is rendered with,
+        if preview is cropped or zoomed and crop respects subsampling of original clip,
+        clip is cropped before RGB conversion, so conversion works only on visible area,
+        otherwise whole frame is rendered and crop is a view into it, see crop_view()
+        '''
+        crop = tuple(self.previewData[-1])
+        if len(self.previewData) == 1 or self.diff_ref is not None:
+            return tuple(self.previewData[0])
+        if (i, crop) not in self.crop_rgbs:
+            self.crop_rgbs = {k: rgb for k, rgb in self.crop_rgbs.items() if k[1] == crop}   #keeping only current crop
+            try:
+                self.crop_rgbs[(i, crop)] = self.cropped_rgb(i, crop)
+            except (TypeError, ValueError, vs.Error) as err:
+                self.log(f'[Preview.source_crop] clip{i+1} cannot be cropped before RGB conversion, whole frame is rendered: {err}')
+                self.crop_rgbs[(i, crop)] = None
+        return crop if self.crop_rgbs[(i, crop)] is not None else tuple(self.previewData[0])
+
+    def cropped_rgb(self, i, crop):
+        '''
+        returns rgb clip of original clip i cropped by CropAbs(), or None if it cannot be cropped in its own subsampling,
+        matrix is taken from whole clip, because defaults depend on resolution
+        '''
+        clip = self.clips_orig[i]
+        width, height, left, top = crop
+        sw, sh = 1 << clip.format.subsampling_w, 1 << clip.format.subsampling_h
+        self.rgb(i)
+        if self.rgbs_error[i] or clip.format.name.startswith('Compat') or (width | left) % sw or (height | top) % sh:
+            return None
+        conversions = Conversions()
+        try:
+            matrix_in_s = conversions.getMatrix(clip, self.matrix_in_s, self.rgbs_props[i])[1]
+            cropped = core.std.CropAbs(clip, width=width, height=height, left=left, top=top)
+            rgb, _ = conversions.toRGB(cropped, matrix_in_s=matrix_in_s, depth=8, kernel=self.kernel, sample_type=vs.INTEGER)
+        except vs.Error:
+            return None
+        return rgb if isinstance(rgb, vs.VideoNode) else None
+
+    def crop_view(self, img):
+        '''
+        returns current crop or zoom of full image, it is numpy view, not a copy
+        '''
+        if len(self.previewData) == 1:
+            return img
+        width, height, left, top = self.previewData[-1]
+        return img[top:top+height, left:left+width]
+
+    def preview_size(self):
+        '''
+        width and height of what is previewed, clip's own dimensions if there is no crop or zoom
+        '''
+        if len(self.previewData) == 1:
+            return self.clips_orig[self.i].width, self.clips_orig[self.i].height
+        return self.previewData[-1][0], self.previewData[-1][1]
+
+    def prefetch_other_clips(self):
+        '''
+        requesting current frame (and next frames if playing) from all other clips as well, not waiting for them,
+        so switching clips shows frame that is already rendered,
+        the same node and crop are requested that show_frame() uses for that clip, see source_crop()
+        '''
+        full_crop = tuple(self.previewData[0])
+        for i in range(len(self.rgbs)):
+            if i == self.i or (i, self.frame, full_crop) in self.cache:
+                continue
+            if self.rgbs_error[i] is None:
+                self.load_rgb_background(i)                  #not converted yet, it is prefetched once it is ready
+                continue
+            try:
+                crop = self.source_crop(i)
+                if (i, self.frame, crop) in self.cache:
+                    continue
+                node = self.rgb(i) if crop == full_crop else self.crop_rgbs[(i, crop)]
+                self.prefetchers[i].prefetch(node, self.frame, self.frames[1], ahead=self.play)
+            except:
+                self.prefetchers[i].reset()                  #error is shown later if that clip is selected
             
     def error_frame(self):
         self.play = 0
@@ -539,12 +1340,8 @@ class Preview:
         err_clip = core.std.BlankClip(self.clips_orig[self.i],  format=vs.RGB24, length=1).text.Text(err+info)
         return err_clip.get_frame(0)
     
-    def delay_it(self):       
-        while True:
-           new = timeit.default_timer()
-           if new >= self.ref + self.delay:
-               self.ref = new
-               break        
+    def delay_it(self):
+        self.pacer.wait()
 
     def get_platform(self):
         '''
@@ -575,9 +1372,11 @@ class Preview:
     def pause_play(self):
         if self.play:
             self.play = 0
+            if self.pacer.dropped or self.pacer.late:
+                self.print_info(self.pacer.report())
         else:
             self.play = 1
-            self.ref = timeit.default_timer()       
+            self.pacer.start()
             
     def log(self, *args):
         '''
@@ -598,6 +1397,27 @@ class Preview:
     def frame_props(self):
         self.log(f'\nclip{self.i+1} {self.clips_orig[self.i].format.name}, properties of frame {self.frame}:')
         self.log(self.get_frame_props(self.clips_orig[self.i], self.frame))
+
+    def source_frame(self, clip, frame):
+        '''
+        returns vs.VideoFrame of original clip,
+        last one is kept, so props and pixel values for frame on screen are requested only once, not for every mouse move,
+        (source frame was just rendered for preview, so vapoursynth usually has it in its cache anyway)
+        '''
+        if self.src is None or self.src[0] is not clip or self.src[1] != frame:
+            self.src = (clip, frame, clip.get_frame(frame))
+        return self.src[2]
+
+    @staticmethod
+    def prop_value(prop_value):
+        '''
+        frame property value in printable form
+        '''
+        if isinstance(prop_value, bytes):
+            return prop_value.decode()
+        if isinstance(prop_value, vs.VideoFrame):        #this is a wild guess for alpha, did not look into it yet
+            return 'yes'
+        return prop_value
        
     def get_frame_props(self, clip, frame):
         '''
@@ -606,14 +1426,9 @@ class Preview:
         '''
 
         info = []
-        props_dict = dict(clip.get_frame(frame).props)
+        props_dict = dict(self.source_frame(clip, frame).props)
         for prop, prop_value in props_dict.items():
-            if isinstance(prop_value, bytes):
-                prop_value = prop_value.decode()
-                
-            elif isinstance(prop_value, vs.VideoFrame):  #this is a wild guess for alpha, did not look into it yet
-                prop_value = 'yes'
-                
+            prop_value = self.prop_value(prop_value)
             info.append('  {: <25}{}'.format(prop, prop_value))
             try:
                 info.append('={}'.format(PROPS[prop][prop_value]))
@@ -643,6 +1458,17 @@ class Preview:
         x1,x2,y1,y2    current selection points (rectangle)
         width, height  width which is (x2-x1) and height (y2-y1) ,for current rectangle      
         '''
+        if self.display_scale:                     #image on screen is downscaled, coordinates are in image pixels
+            x = min(int(x*self.display_scale[0]), self.img.shape[1]-1)
+            y = min(int(y*self.display_scale[1]), self.img.shape[0]-1)
+        if self.grid_on and self.grid_layout:      #coordinates within tile, clip under mouse becomes current clip
+            cols, width, height = self.grid_layout
+            t = y // height * cols + x // width
+            if 0 <= t < len(self.grid):
+                self.i = self.grid[t]
+            x, y = x % width, y % height
+            if event != cv2.EVENT_MOUSEMOVE:
+                return                             #crop is selected outside of grid, grid follows it
         if event == cv2.EVENT_LBUTTONDOWN:
             self.useX = True
             self.useY = True
@@ -669,19 +1495,18 @@ class Preview:
                 
             if self.isCropping and self.drawing and not self.panning:
                 rectangle = self.new_rectangle(x,y,flags&cv2.EVENT_FLAG_SHIFTKEY)
-                self.live_crop_info(rectangle)
-                if not self.play:
-                    cv2.imshow(self.title, self.img_and_selection(self.img,rectangle,self.color))              
+                self.redraw_selection(rectangle)
                 
             elif self.panning:
                 rectangle = self.move_rectangle(x,y,flags&cv2.EVENT_FLAG_SHIFTKEY)
-                self.live_crop_info(rectangle)
-                if not self.play:
-                    cv2.imshow(self.title, self.img_and_selection(self.img,rectangle,self.color))              
+                self.redraw_selection(rectangle)
                 
         elif event == cv2.EVENT_LBUTTONUP:
             self.panning = False
             self.drawing = False
+            if self.selection_dirty and self.x1 is not None:    #last move was skipped, paused loop may wait for a key, so it is drawn now
+                self.selection_drawn = 0
+                self.redraw_selection((self.x1,self.y1,self.x2,self.y2))
             if self.tx == x and self.ty == y:      #mouse touched screen but did not moved, no drawing happened, quit cropping 
                 self.isCropping = False                
                 self.print_info(self.cropping_line_text(*self.previewData[-1]))
@@ -718,10 +1543,9 @@ class Preview:
         self.tx = x 
         self.ty = y
         #self.play = 0                            #stopping playback while starting to crop
-        self.w      = self.rgbs[self.i].width
-        self.h      = self.rgbs[self.i].height
-        self.origw = self.rgbs_orig[self.i].width
-        self.origh = self.rgbs_orig[self.i].height            
+        self.w, self.h = self.preview_size()
+        self.origw = self.clips_orig[self.i].width
+        self.origh = self.clips_orig[self.i].height            
         self.xa = x - x % self.modx_subs          #snapping to correct subsumpling column
         self.ya = y - y % self.mody_subs          #snapping to correct subsumpling line
 
@@ -963,22 +1787,35 @@ class Preview:
         getattr(self, f'set_object_{self.object}')(self.x1,self.y1)      #set object for another move if there is
                                            
         
+    def redraw_selection(self, rectangle):
+        '''
+        mouse moves come much faster than screen refresh, so while dragging, selection is drawn at most SELECTION_FPS times per second,
+        position that was skipped is drawn by show loop a moment later, see background_wait(),
+        or when mouse button is released, because paused loop could be waiting for a key and mouse events do not end that wait
+        '''
+        now = timeit.default_timer()
+        if now - self.selection_drawn < 1/SELECTION_FPS:
+            self.selection_dirty = True
+            return
+        self.selection_drawn = now
+        self.selection_dirty = False
+        self.live_crop_info(rectangle)
+        if not self.play:
+            cv2.imshow(self.title, self.img_and_selection(self.img,rectangle,self.color))
+        
     def flash_object(self, r, flash_rectangles):
-        img = self.img_and_selection(self.img, r, self.color)
+        img = self.img_and_selection(self.img, r, self.color).copy()        #overlay keeps its image for next move
         for tuple_pair in flash_rectangles:
             cv2.rectangle(img, *tuple_pair, self.flash_color, 1, cv2.LINE_AA)
         cv2.imshow(self.title, img)
         
     def img_and_selection(self, img, r, c):
-        x1,y1,x2,y2 = r
-        final = cv2.bitwise_not(img)
-        #crop = cv2.UMat(img, [y1, y2], [x1, x2]) #to do accelerating
-        final[y1:y2, x1:x2] = img[y1:y2, x1:x2]
-        cv2.line(final, (x1, 0), (x1, self.h), c, 1, cv2.LINE_AA)
-        cv2.line(final, (0, y1), (self.w, y1), c, 1, cv2.LINE_AA)
-        cv2.line(final, (max(x1,x2-1), 0), (max(x1,x2-1), self.h), c, 1, cv2.LINE_AA)
-        cv2.line(final, (0, max(y1,y2-1)), (self.w, max(y1,y2-1)), c, 1, cv2.LINE_AA)
-        return final
+        '''
+        returned image belongs to overlay, it must not be modified,
+        it is never downscaled, so mouse coordinates are image pixels from now on
+        '''
+        self.display_scale = None
+        return self.overlay.compose(img, self.img_id, r, c)
 
     def live_crop_info(self, r):
         x1,y1,x2,y2 = r
@@ -987,9 +1824,139 @@ class Preview:
 
         
     def trackbar_change(self, pos):
+        if int(pos) == self.frame:
+            return                                       #setTrackbarPos() in show loop
         self.frame = int(pos)
         if self.play == 0:
-            self.show_frame()        
+            self.seeking = True
+            self.slider_moved = timeit.default_timer()
+            self.show_frame()
+
+    def seek_frame(self):
+        '''
+        while slider is dragged and paused, requests for frames are not queued for every slider position,
+        only one proxy frame (SLIDER_PROXY_SCALE times smaller, see proxy_rgb()) is requested at a time, always for latest position,
+        positions that slider passed meanwhile are skipped, proxy is shown as soon as it is rendered, it never waits for it,
+        when slider rests SLIDER_SETTLE seconds, exact frame is rendered by show_frame() as usual,
+        frames that are in cache or proxy store already are shown right away,
+        filter chain still renders full frames for proxies, so dragging is not faster than the chain, but requests do not pile up
+        returns True if exact frame is not rendered yet
+        '''
+        if self.proxy_request is not None and self.proxy_request[1].done():
+            n, future = self.proxy_request
+            self.proxy_request = None
+            try:
+                self.show_proxy(self.proxy_converter.convert(future.result()))
+                self.proxy_shown = n
+            except vs.Error:
+                pass
+        settled = timeit.default_timer() - self.slider_moved >= SLIDER_SETTLE
+        stored = self.proxy_store(self.i) and self.frame in self.proxies[self.i]
+        if (self.i, self.frame, tuple(self.previewData[0])) in self.cache or stored or (settled and self.proxy_request is None):
+            self.seeking = False
+            self.proxy_shown = None
+            return False
+        if self.proxy_request is None and self.proxy_shown != self.frame and not settled:
+            self.proxy_request = (self.frame, get_frame_async(self.proxy_rgb(self.i), self.frame))
+        return True
+
+    def proxy_store(self, i):
+        '''
+        returns ProxyStore of clip i or None if proxy_dir was not given or clip failed,
+        store name is hash of script, its modification time, clip index, format, dimensions, length, fps, frames and scale
+        and of what clip renders, see proxy_fingerprint(), so the same script run again finds images it rendered before,
+        while editing script or filters starts new store.
+        Frame for fingerprint is requested asynchronously, store is None until it is rendered, show loop never waits for it
+        '''
+        if self.proxy_dir is None:
+            return None
+        if self.proxies[i] is None:
+            rgb = self.rgb(i)
+            if self.rgbs_error[i]:
+                return None
+            if i not in self.fingerprints:
+                self.fingerprints[i] = get_frame_async(rgb, 0)     #load_rgbs() checked frame 0, so it is usually in vapoursynth cache
+            if not self.fingerprints[i].done():
+                return None
+            clip = self.clips_orig[i]
+            script = os.path.abspath(sys.argv[0]) if sys.argv and sys.argv[0] else ''
+            mtime = os.path.getmtime(script) if os.path.isfile(script) else 0
+            try:
+                fingerprint = self.proxy_fingerprint(self.fingerprints[i].result())
+            except vs.Error:
+                self.log(f'[Preview.proxy_store] clip{i+1} frame 0 could not be rendered, proxy store is not used for it')
+                self.proxies[i] = False
+                return None
+            identity = (script, mtime, i, clip.format.name, clip.width, clip.height, clip.num_frames, clip.fps_num, clip.fps_den,
+                        tuple(self.frames), self.proxy_scale, self.matrix_in_s, self.kernel, fingerprint)
+            name = hashlib.sha1(repr(identity).encode()).hexdigest()[:16]
+            shape = (max(1, rgb.height//self.proxy_scale), max(1, rgb.width//self.proxy_scale), 3)
+            self.proxies[i] = ProxyStore(os.path.join(self.proxy_dir, name), self.frames, shape, log=self.log)
+        return self.proxies[i]
+
+    def proxy_fingerprint(self, f):
+        '''
+        hash of frame props and of every 8th pixel of rgb frame f (frame 0),
+        so stores of different filter chains do not mix, even with the same script or without script (vsedit, REPL)
+        '''
+        digest = hashlib.sha1()
+        digest.update(repr(sorted((k, self.prop_value(v)) for k, v in f.props.items())).encode())
+        for plane in self.converter.planes(f):
+            digest.update(np.ascontiguousarray(plane[::8, ::8]).tobytes())
+        return digest.hexdigest()
+
+    def stored_img(self, i, n):
+        '''
+        returns image of frame n from proxy store, blown up to full size if stored smaller, or None
+        '''
+        store = self.proxy_store(i)
+        img = store.get(n) if store else None
+        if img is None or self.proxy_scale == 1:
+            return img
+        clip = self.clips_orig[i]
+        return cv2.resize(img, (clip.width, clip.height), interpolation=cv2.INTER_LINEAR)
+
+    def flush_proxies(self):
+        for store in getattr(self, 'proxies', []):
+            if store: store.flush()
+
+    def proxy_rgb(self, i):
+        '''
+        rgb clip for slider proxies, original clip is downscaled SLIDER_PROXY_SCALE times in its own format first,
+        so RGB conversion and interleaving work on small frame, if that is not possible (Compat formats), rgb clip is downscaled
+        '''
+        if i not in self.proxy_rgbs:
+            rgb = self.rgb(i)
+            clip = self.clips_orig[i]
+            proxy = None
+            if not self.rgbs_error[i] and not clip.format.name.startswith('Compat'):
+                sw, sh = 1 << clip.format.subsampling_w, 1 << clip.format.subsampling_h
+                width = max(sw, clip.width//SLIDER_PROXY_SCALE//sw*sw)
+                height = max(sh, clip.height//SLIDER_PROXY_SCALE//sh*sh)
+                conversions = Conversions()
+                try:
+                    matrix_in_s = conversions.getMatrix(clip, self.matrix_in_s, self.rgbs_props[i])[1]
+                    small = core.resize.Bilinear(clip, width=width, height=height)
+                    proxy, _ = conversions.toRGB(small, matrix_in_s=matrix_in_s, depth=8, kernel=self.kernel, sample_type=vs.INTEGER)
+                except vs.Error:
+                    proxy = None
+            if not isinstance(proxy, vs.VideoNode):
+                width, height = max(1, rgb.width//SLIDER_PROXY_SCALE), max(1, rgb.height//SLIDER_PROXY_SCALE)
+                proxy = core.resize.Bilinear(rgb, width=width, height=height)
+            self.proxy_rgbs[i] = proxy
+        return self.proxy_rgbs[i]
+
+    def show_proxy(self, img):
+        '''
+        shows current crop or zoom of proxy image, window blows it up
+        '''
+        width, height, left, top = self.previewData[-1]
+        sx = self.previewData[0][0]/img.shape[1]
+        sy = self.previewData[0][1]/img.shape[0]
+        x1, y1 = int(left/sx), int(top/sy)
+        img = img[y1:max(y1+1, int((top+height)/sy)), x1:max(x1+1, int((left+width)/sx))]
+        cv2.imshow(self.title, img)
+        self.display_scale = (width/img.shape[1], height/img.shape[0])
 
     def reset_preview(self):
         self.reset_preview()
@@ -1106,11 +2073,10 @@ class Preview:
             
         #self.play = 0                  #stopping preview
             
-        current_w = self.rgbs[self.i].width
-        current_h = self.rgbs[self.i].height
+        current_w, current_h = self.preview_size()
         
         if x == -1:
-            x,y = (current_w/2,current_h/2)
+            x,y = (current_w//2,current_h//2)
             
         #new width and height for cropping (half whatever window has now) and respecting mod
         w = int(current_w/2)
@@ -1163,7 +2129,7 @@ class Preview:
         
         pt=''
         try:
-            pt = f'{clip.get_frame(self.frame).props["_PictType"].decode()}'
+            pt = f'{self.source_frame(clip, self.frame).props["_PictType"].decode()}'
         except:
             pass        
         info = []
@@ -1185,7 +2151,8 @@ class Preview:
             info.append(f'could not read source format, values: {p0}, {p1}, {p2}')
             
         #preview clip values      
-        info.append('    preview: r:{2}  g:{1}  b:{0}'.format(*self.img[y][x]))  #tuple is returned from numpy array: (B,G,R)
+        img = self.grid_slots.get(self.i, self.img) if self.grid_on else self.img    #mouse coordinates are within tile in grid
+        info.append('    preview: r:{2}  g:{1}  b:{0}'.format(*img[y][x]))  #tuple is returned from numpy array: (B,G,R)
         info = ''.join(info)
         self.log(info)
         if self.Qt:
@@ -1197,7 +2164,7 @@ class Preview:
         p0,p1,p2 could be Y,U,V or R,G,B values
         '''
         try:
-            fr = clip.get_frame(frame)
+            fr = self.source_frame(clip, frame)
             planes =[fr.get_read_array(i) for i in range(clip.format.num_planes)]
         except:
             pass
@@ -1238,6 +2205,67 @@ class Preview:
             except: p2 = 'x'
             
         return p0,p1,p2    
+
+    def selection_stats(self):
+        '''
+        prints statistics of original clip planes for selected rectangle, or for preview area if nothing is selected
+        '''
+        if self.x1 is not None and self.isCropping:
+            left, top = self.get_absolute_offsets(self.x1, self.y1)
+            width, height = self.x2 - self.x1, self.y2 - self.y1
+        else:
+            width, height, left, top = self.previewData[-1]
+        clip = self.clips_orig[self.i]
+        try:
+            stats = self.region_stats(clip, self.frame, left, top, width, height)
+        except (vs.Error, ValueError) as err:
+            self.print_info(f'clip{self.i+1}: statistics failed: {err}')
+            return
+        info = [f'clip{self.i+1}: Frame:{self.frame}  Area: {width}x{height} at {left},{top}   {clip.format.name}']
+        for name, mean, minimum, maximum, std in stats:
+            info.append(f'  {name}  mean:{mean:.3f}  min:{minimum}  max:{maximum}  stddev:{std:.3f}')
+        self.log('\n'.join(info))
+        if self.Qt:
+            self.print_statusBar('   '.join(info))
+
+    def region_stats(self, clip, frame, left, top, width, height):
+        '''
+        returns [(plane name, mean, min, max, stddev), ...] for a rectangle of original clip,
+        chroma planes are reduced by subsampling the same way as in get_pixel_values(),
+        packed CompatYUY2 and CompatBGR32 are unpacked with numpy for whole area at once
+        '''
+        if width <= 0 or height <= 0:
+            raise ValueError('[Preview] empty area')
+        fr = self.source_frame(clip, frame)
+        def plane(p):
+            return np.asarray(fr[p]) if isAPI4 else np.asarray(fr.get_read_array(p))
+        
+        if clip.format.name == 'CompatYUY2':                 #2byte packs YU,YV,... Y is low byte, U on even, V on odd columns
+            packs = plane(0)[top:top+height, left:left+width]
+            chroma = packs >> 8
+            u = left % 2                                     #first column in area with U
+            planes = [('Y', packs & 0xFF), ('U', chroma[:, u::2]), ('V', chroma[:, 1-u::2])]
+            
+        elif clip.format.name == 'CompatBGR32':              #4byte packs BGRA, vertically flipped
+            packs = plane(0)[clip.height-top-height : clip.height-top, left:left+width]
+            planes = [('R', (packs >> 16) & 0xFF), ('G', (packs >> 8) & 0xFF), ('B', packs & 0xFF)]
+            
+        else:
+            cf = clip.format.color_family
+            names = 'RGB' if cf == vs.RGB else 'YUV'
+            planes = [(names[0], plane(0)[top:top+height, left:left+width])]
+            sw, sh = clip.format.subsampling_w, clip.format.subsampling_h
+            ys, ye = top >> sh, ((top+height-1) >> sh) + 1   #rows and columns of chroma that area touches
+            xs, xe = left >> sw, ((left+width-1) >> sw) + 1
+            for p in range(1, clip.format.num_planes):
+                planes.append((names[p], plane(p)[ys:ye, xs:xe]))
+                
+        stats = []
+        for name, arr in planes:
+            if arr.size == 0:
+                raise ValueError(f'[Preview] area is outside of plane {name}')
+            stats.append((name, arr.mean(dtype=np.float64), arr.min(), arr.max(), arr.std(dtype=np.float64)))
+        return stats
         
        
     def left_arrow(self):
@@ -1258,14 +2286,13 @@ class Preview:
         if self.img_dir and not os.path.isdir(self.img_dir):
             self.log('not a valid path: ', self.img_dir)
             return
-        img_path = os.path.join(self.img_dir, self.print_clip_name() +'_{:02}_{}_frame_{:07}.png'.format(self.i+1,self.previewData[-1],self.frame))
+        img_path = self.image_path(self.print_clip_name(), self.i, self.previewData[-1], self.frame, one_to_one=False)
         '''
         self.img is numpy data and up-scaled by openCV to fit whatever window,
         it needs to be upscaled for real writing otherwise print would be just real clip resolution (1:1, smaller).
         '''
         _,_,w,h = cv2.getWindowImageRect(self.title)
-        resized = cv2.resize(self.img, (w, h), interpolation = cv2.INTER_NEAREST)
-        cv2.imwrite(img_path, resized)
+        self.writer.write(img_path, self.own_img(), size=(w, h))
         self.print_info(self.print_clip_name() +': {}  writing image: {}'.format(self.i,img_path))        
 
     ''' cv2.resize interpolation:
@@ -1282,9 +2309,229 @@ class Preview:
         if self.img_dir and not os.path.isdir(self.img_dir):
             self.log('not a valid path: ', self.img_dir)
             return
-        img_path = os.path.join(self.img_dir, self.print_clip_name() +'_{:02}__1;1_{}_frame_{:07}.png'.format(self.i+1,self.previewData[-1],self.frame))
-        cv2.imwrite(img_path, self.img)
+        img_path = self.image_path(self.print_clip_name(), self.i, self.previewData[-1], self.frame)
+        self.writer.write(img_path, self.own_img())
         self.print_info(self.print_clip_name() +': {}  writing image: {}'.format(self.i,img_path))
+
+    def image_path(self, name, i, crop, frame, one_to_one=True):
+        if one_to_one: return os.path.join(self.img_dir, name +'_{:02}__1;1_{}_frame_{:07}.png'.format(i+1, crop, frame))
+        else:          return os.path.join(self.img_dir, name +'_{:02}_{}_frame_{:07}.png'.format(i+1, crop, frame))
+
+    def export(self, frames=None, clips=None, step=1, crop='current', depth=None):
+        '''
+        writes 1:1 PNG images of frames for clips into img_dir, same names as using key 'W',
+        frames are requested from all clips concurrently with get_frame_async() and images are encoded in background threads,
+        so it uses all cores, throughput is printed at the end
+        frames   list with first frame and last frame+1, same as Preview argument, default is Preview's frames
+        clips    list of clip indexes, 0 is first clip, default is all clips
+        step     every step-th frame is written
+        crop     'current' is current crop or zoom, None is whole frame, or list [width, height, left, top]
+        depth    number of frames in flight, default is vapoursynth's core.num_threads for each clip
+        example, after preview window is closed or with headless=True:
+        p = Preview([clip1, clip2], headless=True)
+        p.export(frames=[1000,2000], step=10)
+        '''
+        frames = frames or self.frames
+        clips = list(range(len(self.rgbs))) if clips is None else clips
+        if crop == 'current':
+            crop = self.previewData[-1]
+        elif crop is None:
+            crop = self.previewData[0]
+        else:
+            crop = list(crop)
+            self.validate_crop(*crop)
+        name = 'clip' if crop == self.previewData[0] else 'cropped_clip'
+        width, height, left, top = crop
+        if depth is None:
+            depth = max(1, core.num_threads) * len(clips)
+        converter = BGRConverter()
+        count = 0
+        start = timeit.default_timer()
+        requests = ((i, self.rgb(i), n) for n in range(frames[0], frames[1], step) for i in clips)
+        for (i, n), future in request_frames(requests, depth):
+            try:
+                img = converter.convert(future.result())
+            except vs.Error as err:
+                self.log(f'[Preview.export] clip{i+1} frame {n} failed: {err}')
+                continue
+            converter.detach()                                #image belongs to writer
+            if crop != self.previewData[0]:
+                img = img[top:top+height, left:left+width]
+            self.writer.write(self.image_path(name, i, crop, n), img)
+            count += 1
+        self.writer.flush()
+        elapsed = timeit.default_timer() - start
+        self.log(f'[Preview.export] {count} images written into {self.img_dir}')
+        self.log(f'  {elapsed:.2f}s, {count/elapsed:.2f} images per second')
+        return count
+
+    def export_props(self, path, frames=None, clips=None, step=1, props=None, depth=None):
+        '''
+        writes frame properties of original clips into CSV file (path ends with '.csv') or JSON Lines file ('.jsonl' or '.json'),
+        one row (line) for each frame and clip, frames are requested concurrently with get_frame_async(), rows are in frame order,
+        JSON Lines are written as they come, CSV is written at the end, because its columns are properties found in all frames
+        frames   list with first frame and last frame+1, same as Preview argument, default is Preview's frames
+        clips    list of clip indexes, 0 is first clip, default is all clips
+        step     every step-th frame is written
+        props    list of property names, default is all properties of all clips and frames,
+                 missing property is empty (CSV) or not present (JSON Lines)
+        depth    number of frames in flight, default is vapoursynth's core.num_threads for each clip
+        example:
+        p = Preview(clip, headless=True)
+        p.export_props('props.csv', props=['_PictType', '_Combed', '_SceneChangePrev'])
+        '''
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in ('.csv', '.jsonl', '.json'):
+            raise ValueError(f'[Preview.export_props] path must end with .csv, .jsonl or .json, got: {path}')
+        frames = frames or self.frames
+        clips = list(range(len(self.clips_orig))) if clips is None else clips
+        if depth is None:
+            depth = max(1, core.num_threads) * len(clips)
+        fieldnames = {'clip': None, 'frame': None} if props is None else dict.fromkeys(['clip', 'frame'] + list(props))
+        rows = []
+        count = 0
+        start = timeit.default_timer()
+        requests = ((i, self.clips_orig[i], n) for n in range(frames[0], frames[1], step) for i in clips)
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            for (i, n), future in request_frames(requests, depth):
+                try:
+                    frame_props = dict(future.result().props)
+                except vs.Error as err:
+                    self.log(f'[Preview.export_props] clip{i+1} frame {n} failed: {err}')
+                    continue
+                row = {'clip': i+1, 'frame': n}
+                for prop, prop_value in frame_props.items():
+                    if props is None or prop in props:
+                        row[prop] = self.prop_value(prop_value)
+                if ext == '.csv':
+                    if props is None:
+                        fieldnames.update(dict.fromkeys(row))                #columns in order they were found
+                    rows.append(row)
+                else:
+                    file.write(json.dumps(row, default=str) + '\n')
+                count += 1
+            if ext == '.csv':
+                writer = csv.DictWriter(file, fieldnames=list(fieldnames), restval='')
+                writer.writeheader()
+                writer.writerows(rows)
+        elapsed = timeit.default_timer() - start
+        self.log(f'[Preview.export_props] {count} rows written into {path}')
+        self.log(f'  {elapsed:.2f}s, {count/elapsed:.2f} frames per second')
+        return count
+
+    def scan(self, reference=0, clips=None, frames=None, step=1, path=None, worst=10, depth=None, workers=None):
+        '''
+        compares clips against reference clip over frames and writes PSNR, SSIM and max absolute difference
+        of luma (first plane of original clips) for every frame into CSV file,
+        frames are requested from all clips concurrently with get_frame_async() and metrics run in a thread pool,
+        so it uses all cores, worst frames (lowest SSIM) are logged and key 'B' jumps to them in preview
+        reference  index of reference clip, 0 is first clip
+        clips      list of clip indexes to compare, default is all other clips, they must have reference's format and resolution
+        frames     list with first frame and last frame+1, same as Preview argument, default is Preview's frames
+        step       every step-th frame is compared
+        path       CSV file path, default is metrics.csv in img_dir
+        worst      number of worst frames to keep for each clip
+        depth      number of frames in flight, default is vapoursynth's core.num_threads for each clip
+        workers    number of threads for metrics, default is number of CPU's
+        example:
+        p = Preview([source, encode1, encode2], headless=True)
+        p.scan(frames=[0, 30000])
+        p.show()                                                       #key 'B' jumps to worst frames
+        '''
+        frames = frames or self.frames
+        clips = [i for i in range(len(self.clips_orig)) if i != reference] if clips is None else list(clips)
+        ref = self.clips_orig[reference]
+        for i in clips:
+            clip = self.clips_orig[i]
+            if i == reference or clip.format.id != ref.format.id or (clip.width, clip.height) != (ref.width, ref.height):
+                raise ValueError(f'[Preview.scan] clip{i+1} must be other clip than reference clip{reference+1} '
+                                 f'with the same format and resolution')
+        peak = 1.0 if ref.format.sample_type == vs.FLOAT else (1 << ref.format.bits_per_sample) - 1
+        path = path or os.path.join(self.img_dir, 'metrics.csv')
+        nodes = [reference] + clips
+        if depth is None:
+            depth = max(1, core.num_threads) * len(nodes)
+        workers = workers or os.cpu_count() or 1
+        def luma(f):
+            return np.asarray(f[0]) if isAPI4 else np.asarray(f.get_read_array(0))
+        
+        results = {i: [] for i in clips}                              #[(ssim, psnr, max diff, frame), ...] for each clip
+        jobs = collections.deque()
+        def write_rows(limit):                                         #metrics in frame order, waiting only if too many are queued
+            while len(jobs) > limit:
+                n, i, future = jobs.popleft()
+                value_psnr, value_ssim, max_diff = future.result()
+                writer.writerow([n, i+1, reference+1, value_psnr, value_ssim, max_diff])
+                results[i].append((value_ssim, value_psnr, max_diff, n))
+                
+        start = timeit.default_timer()
+        requests = ((i, self.clips_orig[i], n) for n in range(frames[0], frames[1], step) for i in nodes)
+        with open(path, 'w', newline='') as file, ThreadPoolExecutor(max_workers=workers) as pool:
+            writer = csv.writer(file)
+            writer.writerow(['frame', 'clip', 'reference', 'psnr', 'ssim', 'max_abs_diff'])
+            planes = {}
+            for (i, n), future in request_frames(requests, depth):
+                try:
+                    planes[i] = luma(future.result())
+                except vs.Error as err:
+                    self.log(f'[Preview.scan] clip{i+1} frame {n} failed: {err}')
+                    planes[i] = None
+                if i != nodes[-1]:
+                    continue                                           #frames of all clips for n are not here yet
+                for c in clips:
+                    if planes[reference] is not None and planes[c] is not None:
+                        jobs.append((n, c, pool.submit(plane_metrics, planes[reference], planes[c], peak)))
+                planes = {}
+                write_rows(2*workers)
+            write_rows(0)
+        elapsed = timeit.default_timer() - start
+        
+        count = sum(len(rows) for rows in results.values())
+        self.log(f'[Preview.scan] {count} comparisons written into {path}')
+        self.log(f'  {elapsed:.2f}s, {count/elapsed:.2f} comparisons per second')
+        self.worst_frames = []
+        for i, rows in results.items():
+            if not rows:
+                continue
+            finite = [row[1] for row in rows if row[1] != float('inf')]
+            mean_psnr = sum(finite)/len(finite) if finite else float('inf')
+            mean_ssim = sum(row[0] for row in rows)/len(rows)
+            self.log(f'  clip{i+1} vs clip{reference+1}: mean PSNR {mean_psnr:.2f} dB  mean SSIM {mean_ssim:.4f}, worst frames:')
+            for value_ssim, value_psnr, max_diff, n in sorted(row for row in rows if row[2])[:worst]:    #identical frames are not worst
+                self.log(f'    frame {n:>7}  PSNR {value_psnr:>6.2f} dB  SSIM {value_ssim:.4f}  max diff {max_diff}')
+                self.worst_frames.append((n, i, value_psnr, value_ssim, max_diff))
+        self.worst_frames.sort(key=lambda row: row[3])
+        self.worst_index = -1
+        return self.worst_frames
+
+    def worst_frame(self):
+        '''
+        jumps to next worst frame from scan() and to its clip
+        '''
+        if not self.worst_frames:
+            self.print_info('no worst frames, run Preview.scan() first')
+            return
+        self.worst_index = (self.worst_index + 1) % len(self.worst_frames)
+        n, i, value_psnr, value_ssim, max_diff = self.worst_frames[self.worst_index]
+        if not self.frames[0] <= n < self.frames[1]:
+            self.print_info(f'worst frame {n} is out of previewed frames')
+            return
+        self.frame = n
+        self.i = i
+        self.print_info(f'worst {self.worst_index+1}/{len(self.worst_frames)}: clip{i+1} frame {n}  '
+                        f'PSNR {value_psnr:.2f} dB  SSIM {value_ssim:.4f}  max diff {max_diff}')
+
+    def own_img(self):
+        '''
+        returns self.img that is not going to be overwritten by next frame, so it could be written in background,
+        cached images are never modified, but converter's buffer is, so converter gets a new one,
+        grid canvas is reused for next frames, so it is copied
+        '''
+        if self.grid_on:
+            return self.img.copy()
+        if self.full_img is self.converter.buffer:
+            self.converter.detach()
+        return self.img
         
     def help(self):
         self.log(HOTKEYS_HELP)
@@ -1292,6 +2539,14 @@ class Preview:
     
     def closing(self):
         self.close = True
+        self.stop_workers()
+        self.writer.flush()
+
+    def stop_workers(self):
+        self.loader.shutdown(wait=False)
+        if self.governor: self.governor.stop()
+        if self.scopes: self.scopes.stop()
+        if self.diff_ref is not None: self.metrics.stop()
     
             
     def validate_clips(self):
@@ -1325,8 +2580,8 @@ class Preview:
         try:
             s = self.frames[0]
             e = self.frames[1]-1
-            self.clips_orig[0][s]
-            self.clips_orig[0][e]            
+            if not 0 <= s <= e < len(self.clips_orig[0]):
+                raise IndexError
         except:            
             self.log("wrong 'frames', must be a list of two integers within clip's range")
             self.log("defaulting to frames = [0,{}]".format(len(self.clips_orig[0])))
@@ -1397,6 +2652,56 @@ class Preview:
             else:
                 if not (isinstance(var, int) and var > 1 and var <=20000):
                     raise ValueError(f"[Preview] 'preview_{string}' argument must be positive integer and less than 20000")
+
+    def validate_prefetch(self):
+        '''
+        number of frames requested ahead of playhead during playback,
+        if None, it is vapoursynth's core.num_threads, 0 turns off prefetching
+        '''
+        if self.prefetch is None:
+            self.prefetch = max(1, core.num_threads)
+        elif not isinstance(self.prefetch, int) or isinstance(self.prefetch, bool) or self.prefetch < 0:
+            raise ValueError(f"[Preview] wrong 'prefetch' argument: '{self.prefetch}', it has to be zero or positive integer")
+
+    def validate_proxy(self):
+        '''
+        proxy_dir is None (no proxy store) or directory, it is created if it does not exist,
+        proxy_scale is positive integer, images are stored that many times smaller
+        '''
+        if not isinstance(self.proxy_scale, int) or isinstance(self.proxy_scale, bool) or self.proxy_scale < 1:
+            raise ValueError(f"[Preview] wrong 'proxy_scale' argument: '{self.proxy_scale}', it has to be positive integer")
+        if self.proxy_dir is None:
+            return
+        try:
+            os.makedirs(self.proxy_dir, exist_ok=True)
+        except OSError as err:
+            raise ValueError(f"[Preview] wrong 'proxy_dir' argument: '{self.proxy_dir}', {err}")
+
+    def validate_grid(self):
+        '''
+        grid is None or False (grid is off, key 'X' tiles all clips), True (all clips are tiled)
+        or list of clip indexes to tile, 0 is first clip
+        '''
+        clips = range(len(self.clips_orig))
+        if self.grid is None or isinstance(self.grid, bool):
+            self.grid_on = bool(self.grid)
+            self.grid = list(clips)
+        elif (isinstance(self.grid, (list, tuple)) and self.grid
+              and all(isinstance(i, int) and not isinstance(i, bool) and i in clips for i in self.grid)):
+            self.grid_on = True
+            self.grid = list(self.grid)
+        else:
+            raise ValueError(f"[Preview] wrong 'grid' argument: '{self.grid}', it has to be True, False or list of clip indexes, 0 is first clip")
+
+    def validate_display_cache(self):
+        '''
+        RAM in MB for caching rendered preview images,
+        if None, it is DISPLAY_CACHE_SHARE of vapoursynth cache, 0 turns off caching
+        '''
+        if self.display_cache is None:
+            return
+        if not isinstance(self.display_cache, int) or isinstance(self.display_cache, bool) or self.display_cache < 0:
+            raise ValueError(f"[Preview] wrong 'display_cache' argument: '{self.display_cache}', it has to be zero or positive integer, MB")
             
         
     def validate_mod(self, modx, mody):
@@ -1526,8 +2831,7 @@ class Preview:
         width, height, left, top = self.previewData[-2]
 
         try:              
-            for i, rgb in enumerate(self.rgbs_orig):
-                self.rgbs[i] = core.std.CropAbs(rgb, width, height, left, top)
+            self.validate_crop(width, height, left, top)
         except:
             self.log(f'{self.print_clip_name()}: {self.i+1} preview return failed')    
 
@@ -1539,9 +2843,8 @@ class Preview:
                 self.y1 = y_abs - self.previewData[-2][3]
                 self.x2 = self.x1 + self.width
                 self.y2 = self.y1 + self.height
-                self.w  = self.rgbs[self.i].width
-                self.h  = self.rgbs[self.i].height
                 del self.previewData[-1]
+                self.w, self.h = self.preview_size()
                 self.print_info(self.cropping_line_text(self.width, self.height, x_abs,y_abs))
             else:
                 del self.previewData[-1]
@@ -1554,12 +2857,14 @@ class Preview:
     def crop_to_new(self,width, height, left, top):
         '''
         zoom in or crop
-        crop preview to new width and height and store data into self.previewData
+        crop preview to new width and height and store data into self.previewData,
+        rgb clips are not changed, show_frame() shows that crop as a view into full image if it is in cache (or proxy_dir) already,
+        otherwise it renders frame from source-cropped rgb clip in self.crop_rgbs, so only cropped area is converted,
+        if crop does not respect subsampling, full image is rendered and crop is a view into it, see source_crop(), crop_view()
         '''
         
         try:          
-            for i, rgb in enumerate(self.rgbs_orig):
-                self.rgbs[i] = core.std.CropAbs(rgb, width, height, left, top)
+            self.validate_crop(width, height, left, top)
         except:
             self.log(f'{self.print_clip_name()}: {self.i+1} preview return failed')    
 
@@ -1569,23 +2874,27 @@ class Preview:
 
       
     def reset_preview(self):
-        try:
-            for i, rgb in enumerate(self.rgbs_orig):
-                self.rgbs[i] = rgb
-        except:
-            self.log(f'clip: {self.i+1} preview reset failed in clip or one of clips')
-        else:
-            self.isCropping = False
-            self.redraw_window()
-            self.previewData_reset()
-            self.print_info(self.cropping_line_text(*self.previewData[0]))
+        self.isCropping = False
+        self.redraw_window()
+        self.previewData_reset()
+        self.print_info(self.cropping_line_text(*self.previewData[0]))
 
             
+    def validate_crop(self, width, height, left, top):
+        '''
+        crop must fit into all clips, same as core.std.CropAbs() would check it, values are used as slice indexes as well
+        '''
+        if not all(isinstance(v, int) and not isinstance(v, bool) for v in (width, height, left, top)):
+            raise ValueError(f'[Preview] crop values must be integers: {[width, height, left, top]}')
+        for i, clip in enumerate(self.clips_orig):
+            if width <= 0 or height <= 0 or left < 0 or top < 0 or left + width > clip.width or top + height > clip.height:
+                raise ValueError(f'[Preview] crop does not fit into clip{i+1}')
+
     def previewData_reset(self):
         '''
         creating first list index as original rgb data: width, height, left, top
         '''
-        self.previewData = [[self.rgbs_orig[0].width, self.rgbs_orig[0].height , 0, 0]]
+        self.previewData = [[self.clips_orig[0].width, self.clips_orig[0].height , 0, 0]]
                     
     def redraw_window(self):
         '''
@@ -1632,6 +2941,26 @@ class Preview:
         else:
             return 'clip'
 
+    def processRAM(self):
+        '''
+        RAM used by this process in MB, psutil is needed, otherwise it returns None
+        '''
+        try:
+            return int(psutil.Process().memory_info().rss/1024/1024)
+        except:
+            return None
+
+    def peakRAM(self):
+        '''
+        peak RAM used by this process in MB, fallback if psutil is not installed, Linux and Mac only
+        '''
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return int(peak/1024/1024) if sys.platform == 'darwin' else int(peak/1024)
+        except:
+            return None
+
     def freeRAM(self):
         '''
         getting free RAM
@@ -1644,7 +2973,7 @@ class Preview:
         
         #cross platform try if psutil is installed
         try:
-             mem = pstutil.virtual_memory()
+             mem = psutil.virtual_memory()
              avail = int(mem.available/1024/1024)
              if avail and isinstance(avail, int):
                  return avail
@@ -1697,10 +3026,11 @@ class Conversions:
                  13 : 'chromacl ',
                  14 : 'ictcp'    }  
     
-    def getMatrix(self, clip=None, matrix_in_s=None):
+    def getMatrix(self, clip=None, matrix_in_s=None, props=None):
         '''
         lots of logging,  so its a bit wild with ifs,
         wanted to make clear and print what actually happens, why matrix was selected as such etc...
+        props are frame 0 props if caller has them already, otherwise frame 0 is requested
         '''
         matrix_in = None
         log = ''    
@@ -1721,7 +3051,9 @@ class Conversions:
             
         else:
             try:
-                matrix_in = clip.get_frame(0).props['_Matrix']
+                if props is None:
+                    props = clip.get_frame(0).props
+                matrix_in = props['_Matrix']
             except:
                 log = "[getMatrix] _Matrix NOT found in props\n"
             if matrix_in:
@@ -1745,7 +3077,7 @@ class Conversions:
         return matrix_in, matrix_in_s, log
             
    
-    def toRGB(self, clip=None, matrix_in_s=None, depth=None, kernel=None, sample_type=None):
+    def toRGB(self, clip=None, matrix_in_s=None, depth=None, kernel=None, sample_type=None, props=None):
         '''
         yuv to rgb conversion
         there are bunch of YUV  to RGB scripts out there, but needed to make my own so it prints what it actually does,
@@ -1767,6 +3099,8 @@ class Conversions:
                             if clip is 32bit floating point, it will convert to RGBS 32bit floating point
                             
         depth = 8,9,10,11,12,13,14,15,16 or 32  #same as None, except bit depth is given, not taking it from original clip
+
+        props, frame 0 props of clip, if not given, frame 0 is requested to read _Matrix
         '''
         
         if not isinstance(clip, vs.VideoNode):
@@ -1837,7 +3171,7 @@ class Conversions:
 
         #matrix_in_s   
         if clip.format.color_family == vs.YUV:              
-            matrix_in, matrix_in_s, matrix_log = self.getMatrix(clip, matrix_in_s)
+            matrix_in, matrix_in_s, matrix_log = self.getMatrix(clip, matrix_in_s, props)
             log = log + matrix_log
             
         else: matrix_in_s = None
@@ -1868,6 +3202,760 @@ class Conversions:
         
         return clip, log
 
+
+class Prefetcher:
+    '''
+    read-ahead for playback,
+    keeps up to "depth" upcoming frames requested in advance using vapoursynth's get_frame_async(),
+    so filter chain works on next frames while current frame is on screen.
+    Requested frames are stored in a bounded ring buffer as (frame number, future) pairs, first item is next frame to show.
+    If other frame is requested than expected (seeking, stepping back, 'Home', 'End', slider)
+    or node is changed (clip switch, crop, zoom), buffer is dropped and refilled from that frame.
+    Vapoursynth cannot cancel requests, dropped futures are just ignored.
+    '''
+    def __init__(self, depth=0):
+        self.depth = depth
+        self.buffer = collections.deque(maxlen=max(1, depth))
+        self.node = None
+        self.next = None                                      #next frame number to request
+
+    def reset(self, node=None, n=None):
+        self.buffer.clear()
+        self.node = node
+        self.next = n
+        
+    def request(self, n):
+        self.buffer.append((n, get_frame_async(self.node, n)))
+        self.next = n + 1
+
+    def seek(self, node, n):
+        '''
+        makes frame n first in buffer, requesting it if it is not there
+        '''
+        if node is not self.node:
+            self.reset(node, n)
+        while self.buffer and self.buffer[0][0] < n:         #frames behind playhead are not needed anymore
+            self.buffer.popleft()
+        if not self.buffer or self.buffer[0][0] != n:
+            self.reset(node, n)
+            self.request(n)
+
+    def fill(self, end):
+        '''
+        depth can be lowered later (MemoryGovernor), but never above buffer size it was made with
+        '''
+        while len(self.buffer) < min(self.depth, self.buffer.maxlen) and self.next < end:
+            self.request(self.next)
+
+    def get_frame(self, node, n, end, ahead=True):
+        '''
+        returns vapoursynth frame n from node,
+        if ahead is True, next frames up to end (excluded) are requested in advance
+        '''
+        self.seek(node, n)
+        _, future = self.buffer.popleft()
+        if ahead:
+            self.fill(end)
+        return future.result()
+
+    def prefetch(self, node, n, end, ahead=True):
+        '''
+        same as get_frame() but not waiting for frame n, it is just requested
+        '''
+        self.seek(node, n)
+        if ahead:
+            self.fill(end)
+
+
+class FramePacer:
+    '''
+    timing frames for playback,
+    it sleeps most of the interval between frames and only spins for the last bit, sleep is not precise enough,
+    so vapoursynth threads get CPU instead of a busy loop.
+    If realtime is False, late frame just delays playback, next frames are timed from it.
+    If realtime is True, timing keeps to clip's fps schedule and skip() tells how many frames to drop to catch up.
+    dropped and late are counters for frames that were skipped or shown late
+    '''
+    if sys.platform.startswith('win') and sys.version_info < (3,11):
+        SPIN = 0.016                                         #older python on windows sleeps in ~15.6ms ticks
+    else:
+        SPIN = 0.001
+
+    def __init__(self, delay, realtime=False):
+        self.delay = delay
+        self.realtime = realtime
+        self.ref = timeit.default_timer()                    #time when last frame was shown
+        self.dropped = 0
+        self.late = 0
+
+    def start(self):
+        self.ref = timeit.default_timer()
+
+    def wait(self):
+        target = self.ref + self.delay
+        remaining = target - timeit.default_timer()
+        if remaining > self.SPIN:
+            time.sleep(remaining - self.SPIN)
+        while timeit.default_timer() < target:
+            pass
+        now = timeit.default_timer()
+        if now - target > self.SPIN:
+            self.late += 1
+            self.ref = target if self.realtime else now
+        else:
+            self.ref = target
+
+    def skip(self):
+        '''
+        returns number of frames to drop to get back on schedule, always 0 if not realtime or delay is 0 (no schedule)
+        '''
+        if not self.realtime or not self.delay:
+            return 0
+        behind = int((timeit.default_timer() - self.ref) / self.delay)
+        if behind > 0:
+            self.ref += behind * self.delay
+            self.dropped += behind
+            return behind
+        return 0
+
+    def report(self):
+        return f'playback: dropped frames: {self.dropped}, late frames: {self.late}'
+
+
+def get_frame_async(node, n):
+    '''
+    returns future for frame n,
+    old vapoursynth without get_frame_async() gets frame right away and returns finished future
+    '''
+    if hasattr(node, 'get_frame_async'):
+        return node.get_frame_async(n)
+    future = Future()
+    try:
+        future.set_result(node.get_frame(n))
+    except Exception as err:
+        future.set_exception(err)
+    return future
+
+
+def request_frames(requests, depth):
+    '''
+    pipelined frame requests,
+    requests are (node, frame number) or (key.., node, frame number) tuples,
+    up to depth frames are requested with get_frame_async() ahead,
+    yields (key, future) in the same order as requests, key is frame number if there is no other key
+    '''
+    pending = collections.deque()
+    requests = iter(requests)
+    while True:
+        while len(pending) < max(1, depth):
+            try:
+                *key, node, n = next(requests)
+            except StopIteration:
+                break
+            pending.append((tuple(key) + (n,) if key else n, get_frame_async(node, n)))
+        if not pending:
+            return
+        yield pending.popleft()
+
+
+class BGRConverter:
+    '''
+    vapoursynth RGB24 frame to numpy BGR image for opencv,
+    planes are read as numpy views, no copy, and cv2.merge() interleaves them directly into preallocated contiguous buffer,
+    so there is only one copy per frame and no new allocation if frame dimensions do not change.
+    Buffer is overwritten by next frame, detach() hands current buffer over to caller, if image needs to be kept.
+    '''
+    def __init__(self):
+        self.buffer = None
+
+    def planes(self, f):
+        '''
+        returns B,G,R planes of vapoursynth frame as numpy arrays, no copy
+        '''
+        if isAPI4: return [np.asarray(f[p]) for p in [2,1,0]]
+        else:      return [np.asarray(f.get_read_array(p)) for p in [2,1,0]]
+
+    def convert(self, f, out=None):
+        '''
+        returns BGR image, it is out if passed, otherwise internal buffer
+        '''
+        planes = self.planes(f)
+        if out is None:
+            shape = planes[0].shape + (3,)
+            if self.buffer is None or self.buffer.shape != shape:
+                self.buffer = np.empty(shape, dtype=planes[0].dtype)
+            out = self.buffer
+        cv2.merge(planes, out)
+        return out
+
+    def detach(self):
+        buffer, self.buffer = self.buffer, None
+        return buffer
+
+
+class MemoryGovernor:
+    '''
+    samples available RAM every "interval" seconds in a background thread and keeps "reserve" MB of it free,
+    if there is less, vapoursynth cache and display cache shrink by what is missing, in the same ratio as they were given,
+    and prefetch depth is halved, when there is plenty of RAM again, caches grow back step by step, up to what was given.
+    Vapoursynth cache is set right away in thread, display cache and prefetch depth are not thread safe,
+    show loop takes them with take().
+    '''
+    def __init__(self, sample, vs_cache, display_cache, prefetch, reserve=GOVERNOR_RESERVE, interval=GOVERNOR_INTERVAL):
+        self.sample = sample                                          #function returning available RAM in MB or None
+        self.given = (vs_cache, display_cache, prefetch)
+        self.total = vs_cache + display_cache
+        self.budget = self.total                                      #MB for both caches now
+        self.prefetch = prefetch
+        self.reserve = reserve
+        self.interval = interval
+        self.avail = None
+        self.changes = 0
+        self.pending = None                                           #(display cache, prefetch) for show loop
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            avail = self.sample()
+            if not avail:
+                continue
+            self.avail = avail
+            budget, prefetch = self.budget, self.prefetch
+            if avail < self.reserve:
+                budget = max(GOVERNOR_MIN_CACHE, budget - (self.reserve - avail))
+                if prefetch > 1:
+                    prefetch //= 2
+            elif avail > 2*self.reserve and budget < self.total:
+                budget = min(self.total, budget + (avail - 2*self.reserve)//2)
+                if budget == self.total:
+                    prefetch = self.given[2]
+            if (budget, prefetch) != (self.budget, self.prefetch):
+                self.set(budget, prefetch)
+
+    def set(self, budget, prefetch):
+        display_cache = int(budget * self.given[1] / self.total) if self.total else 0
+        core.max_cache_size = max(1, budget - display_cache)
+        with self.lock:
+            self.budget = budget
+            self.prefetch = prefetch
+            self.pending = (display_cache, prefetch)
+            self.changes += 1
+
+    def set_prefetch(self, prefetch):
+        '''
+        prefetch depth was changed by run_autotune(), it is new given value,
+        pending change was computed for old prefetchers, so it is dropped
+        '''
+        with self.lock:
+            self.given = self.given[:2] + (prefetch,)
+            self.prefetch = prefetch if self.budget == self.total else min(self.prefetch, prefetch)
+            self.pending = None
+
+    def take(self):
+        with self.lock:
+            pending, self.pending = self.pending, None
+        return pending
+
+    def stop(self):
+        self.stopped.set()
+
+
+class ProxyStore:
+    '''
+    rendered BGR preview images of one clip on disk, so frames watched before are read back without vapoursynth,
+    also in later runs, images are in memory-mapped .npy chunks of CHUNK frames, chunk file is created when first frame is put in it,
+    so disk space is used only for parts of clip that were watched,
+    valid.npy has a flag for each frame, set after image is written.
+    put() takes ownership of image and writes it in background thread (resize and memmap write are not on show loop),
+    if "queue" images are waiting already, put() blocks until one is written, flush() waits until all are written
+    '''
+    CHUNK = 64
+    OPEN_CHUNKS = 16                                                  #memmaps kept open
+
+    def __init__(self, directory, frames, shape, queue=4, log=print):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.first = frames[0]
+        self.count = frames[1] - frames[0]
+        self.shape = shape
+        path = os.path.join(directory, 'valid.npy')
+        self.valid = None
+        if os.path.isfile(path):
+            try:
+                self.valid = np.lib.format.open_memmap(path, mode='r+')
+            except (OSError, ValueError):
+                pass
+        if self.valid is None or self.valid.shape != (self.count,):
+            self.valid = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(self.count,))
+        self.chunks = collections.OrderedDict()
+        self.lock = threading.Lock()                                  #chunks are used by show loop and writer thread
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.slots = threading.BoundedSemaphore(queue)
+        self.log = log
+
+    def __contains__(self, n):
+        return 0 <= n - self.first < self.count and bool(self.valid[n - self.first])
+
+    def chunk(self, c, create=False):
+        if c in self.chunks:
+            self.chunks.move_to_end(c)
+            return self.chunks[c]
+        path = os.path.join(self.directory, f'chunk_{c:06}.npy')
+        size = min(self.CHUNK, self.count - c*self.CHUNK)
+        if os.path.isfile(path):
+            arr = np.lib.format.open_memmap(path, mode='r+')
+        elif create:
+            arr = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(size,) + self.shape)
+        else:
+            return None
+        self.chunks[c] = arr
+        while len(self.chunks) > self.OPEN_CHUNKS:
+            self.chunks.popitem(last=False)[1].flush()
+        return arr
+
+    def get(self, n):
+        if n not in self:
+            return None
+        c, k = divmod(n - self.first, self.CHUNK)
+        with self.lock:
+            arr = self.chunk(c)
+        return None if arr is None else arr[k]
+
+    def put(self, n, img):
+        '''
+        img must not be modified after this
+        '''
+        if not 0 <= n - self.first < self.count or n in self:
+            return
+        self.slots.acquire()
+        self.pool.submit(self.write, n, img).add_done_callback(self.done)
+
+    def write(self, n, img):
+        c, k = divmod(n - self.first, self.CHUNK)
+        if img.shape != self.shape:
+            img = cv2.resize(img, (self.shape[1], self.shape[0]), interpolation=cv2.INTER_AREA)
+        with self.lock:
+            self.chunk(c, create=True)[k] = img
+        self.valid[n - self.first] = 1
+
+    def done(self, future):
+        self.slots.release()
+        if future.exception():
+            self.log(f'[ProxyStore] {future.exception()}')
+
+    def flush(self):
+        self.pool.submit(int).result()                                #one writer thread, so all puts before this are written
+        with self.lock:
+            for arr in self.chunks.values():
+                arr.flush()
+        self.valid.flush()
+
+
+class SelectionOverlay:
+    '''
+    preview image with crop selection: inverted image outside of selection, image inside, lines along selection edges,
+    inverted image is made once for each shown image (key), then, when selection changes,
+    only strips where selection or lines were or are now are recomposed,
+    so dragging selection over 4K image costs about the same as over SD image
+    '''
+    MARGIN = 2                                                        #anti-aliased line could touch neighbouring pixels
+
+    def __init__(self):
+        self.key = None
+        self.canvas = None
+
+    def compose(self, img, key, r, color):
+        '''
+        key identifies img content, if it is None, img is new every time
+        '''
+        x1, y1, x2, y2 = r
+        h, w = img.shape[:2]
+        if key is None or key != self.key or self.canvas.shape != img.shape:
+            self.key = key
+            self.inverted = cv2.bitwise_not(img)
+            self.canvas = self.inverted.copy()
+            self.rect = (0, 0, 0, 0)
+            self.strips = []
+        rect = (x1, y1, x2, y2)
+        for dirty in self.subtract(self.rect, rect) + self.subtract(rect, self.rect) + self.strips:
+            self.restore(img, dirty, rect)
+        self.rect = rect
+        m = self.MARGIN
+        self.strips = []
+        for x, y in ((x1, y1), (max(x1, x2-1), max(y1, y2-1))):
+            cv2.line(self.canvas, (x, 0), (x, h), color, 1, cv2.LINE_AA)
+            cv2.line(self.canvas, (0, y), (w, y), color, 1, cv2.LINE_AA)
+            self.strips += [(x-m, 0, x+m+1, h), (0, y-m, w, y+m+1)]
+        return self.canvas
+
+    def restore(self, img, area, rect):
+        '''
+        area of canvas back to inverted image, or to image where it is inside of selection rect
+        '''
+        h, w = img.shape[:2]
+        x1, y1, x2, y2 = max(area[0], 0), max(area[1], 0), min(area[2], w), min(area[3], h)
+        if x1 >= x2 or y1 >= y2:
+            return
+        self.canvas[y1:y2, x1:x2] = self.inverted[y1:y2, x1:x2]
+        x1, y1, x2, y2 = max(x1, rect[0]), max(y1, rect[1]), min(x2, rect[2]), min(y2, rect[3])
+        if x1 < x2 and y1 < y2:
+            self.canvas[y1:y2, x1:x2] = img[y1:y2, x1:x2]
+
+    @staticmethod
+    def subtract(a, b):
+        '''
+        rectangles (x1, y1, x2, y2) that cover a, but not b
+        '''
+        ax1, ay1, ax2, ay2 = a
+        if ax1 >= ax2 or ay1 >= ay2:
+            return []
+        x1, y1, x2, y2 = max(ax1, b[0]), max(ay1, b[1]), min(ax2, b[2]), min(ay2, b[3])
+        if x1 >= x2 or y1 >= y2:
+            return [a]
+        parts = [(ax1, ay1, ax2, y1), (ax1, y2, ax2, ay2), (ax1, y1, x1, y2), (x2, y1, ax2, y2)]
+        return [p for p in parts if p[0] < p[2] and p[1] < p[3]]
+
+
+class FrameCache:
+    '''
+    LRU cache for rendered BGR images (numpy arrays) that are shown on screen,
+    key is (clip index, frame number, crop) and budget is in MB,
+    least recently shown images are dropped if budget is exceeded.
+    Cached images must not be modified, opencv drawing is done on copies.
+    '''
+    def __init__(self, budget):
+        self.images = collections.OrderedDict()
+        self.size = 0                                         #bytes
+        self.budget = 0
+        self.set_budget(budget)
+
+    def set_budget(self, budget):
+        self.budget = budget * 1024 * 1024
+        self.trim()
+
+    def __contains__(self, key):
+        return key in self.images
+
+    def get(self, key):
+        img = self.images.get(key)
+        if img is not None:
+            self.images.move_to_end(key)
+        return img
+
+    def put(self, key, img):
+        '''
+        returns True if image was cached
+        '''
+        if img.nbytes > self.budget:
+            return False
+        old = self.images.pop(key, None)
+        if old is not None:
+            self.size -= old.nbytes
+        self.images[key] = img
+        self.size += img.nbytes
+        self.trim()
+        return True
+
+    def trim(self):
+        while self.size > self.budget:
+            _, img = self.images.popitem(last=False)
+            self.size -= img.nbytes
+
+    def clear(self):
+        self.images.clear()
+        self.size = 0
+
+
+class StageTimer:
+    '''
+    timing stages of preview pipeline,
+    start() sets time reference and lap(stage) stores time in seconds since start() or last lap(),
+    size limits samples to last "size" ones for each stage, None keeps all
+    '''
+    def __init__(self, size=None):
+        self.size = size
+        self.samples = {}
+        self.t = 0
+
+    def start(self):
+        self.t = timeit.default_timer()
+
+    def lap(self, stage):
+        now = timeit.default_timer()
+        if stage not in self.samples:
+            self.samples[stage] = collections.deque(maxlen=self.size)
+        self.samples[stage].append(now - self.t)
+        self.t = now
+
+    def stats(self):
+        '''
+        returns dictionary, stage: (mean, p95, p99) in seconds
+        '''
+        stats = {}
+        for stage, samples in self.samples.items():
+            if samples:
+                a = np.fromiter(samples, dtype=np.float64)
+                stats[stage] = (a.mean(), *np.percentile(a, [95, 99]))
+        return stats
+
+    def report(self):
+        lines = ['  {: <12}{: >10}{: >10}{: >10}'.format('stage', 'mean ms', 'p95 ms', 'p99 ms')]
+        for stage, (mean, p95, p99) in self.stats().items():
+            lines.append(f'  {stage: <12}{mean*1000:>10.2f}{p95*1000:>10.2f}{p99*1000:>10.2f}')
+        return '\n'.join(lines)
+
+
+class ImageWriter:
+    '''
+    writing images on disk in background threads, so PNG encoding does not slow down playback,
+    opencv releases GIL while encoding, so threads run in parallel.
+    write() takes ownership of image, it must not be modified after that,
+    if "queue" images are waiting already, write() blocks until one is written (back-pressure),
+    so RAM does not grow if disk or encoding cannot keep up.
+    flush() waits until all images are written.
+    '''
+    def __init__(self, workers=None, queue=None, log=print):
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 2)//2)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(queue or 2*workers)
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.log = log
+
+    def write(self, path, img, size=None):
+        '''
+        size is (width, height) to resize image to, using nearest neighbour, so pixels are just blown up
+        '''
+        self.slots.acquire()
+        future = self.pool.submit(self.encode, path, img, size)
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self.done)
+        return future
+
+    def encode(self, path, img, size):
+        if size is not None:
+            img = cv2.resize(img, size, interpolation = cv2.INTER_NEAREST)
+        if not cv2.imwrite(path, img):
+            self.log(f'[ImageWriter] failed to write image: {path}')
+
+    def done(self, future):
+        with self.lock:
+            self.pending.discard(future)
+        self.slots.release()
+        if future.exception():
+            self.log(f'[ImageWriter] {future.exception()}')
+
+    def flush(self):
+        with self.lock:
+            pending = list(self.pending)
+        for future in pending:
+            try:
+                future.result()
+            except Exception:
+                pass                                          #already logged in done()
+
+
+class BackgroundWorker(abc.ABC):
+    '''
+    runs work() in a background thread, only for latest submitted job, so show loop never waits for it,
+    one job is worked on at a time, new job is accepted only if thread is idle and at least 1/fps seconds passed from previous one,
+    jobs that are not accepted are just skipped, result() returns finished output only once.
+    '''
+    def __init__(self, fps=None):
+        self.interval = 1/fps if fps else 0
+        self.key = None                                               #key of last submitted job
+        self.started = 0
+        self.busy = False
+        self.job = None
+        self.output = None
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def wants(self, key):
+        return key != self.key and not self.busy and time.perf_counter() - self.started >= self.interval
+
+    def pending(self, key):
+        return key != self.key or self.busy or self.output is not None
+
+    def submit(self, key, *job):
+        '''
+        arrays in job must not be modified after this
+        '''
+        self.key = key
+        self.started = time.perf_counter()
+        self.busy = True
+        self.job = job
+        self.event.set()
+
+    def result(self):
+        with self.lock:
+            output, self.output = self.output, None
+        return output
+
+    def stop(self):
+        self.job = None
+        self.event.set()
+
+    def run(self):
+        while True:
+            self.event.wait()
+            self.event.clear()
+            if self.job is None:
+                return
+            try:
+                output = self.work(*self.job)
+            except Exception:
+                output = None                                         #frame failed in vapoursynth, output just is not updated
+            with self.lock:
+                self.output = output
+            self.busy = False
+
+    @abc.abstractmethod
+    def work(self, *job):
+        '''
+        returns output for submitted job, it runs in background thread, subclasses do the actual work here
+        '''
+
+
+class Scopes(BackgroundWorker):
+    '''
+    luma histogram, waveform, RGB parade and vectorscope computed in a background thread,
+    so playback does not wait for them, opencv releases GIL in calcHist() and resize().
+    submit() hands over a decimated copy of previewed BGR image, luma and chroma are taken from original clip planes
+    if clip is planar YUV or GRAY, otherwise from that BGR image.
+    '''
+    SIZE = 256                                                        #each scope is SIZE x SIZE, scopes image is 2x2 of them
+
+    def __init__(self, fps, width):
+        super().__init__(fps)
+        self.width = width
+
+    def submit(self, key, clip, n, crop, img):
+        '''
+        crop is [width, height, left, top] of img in original clip
+        '''
+        step = -(-max(img.shape[:2]) // self.width)
+        small = img[::step, ::step].copy()                            #img could be overwritten by next frame
+        super().submit(key, clip, n, crop, step, small)
+
+    def yuv(self, clip, n, crop, step, bgr):
+        '''
+        returns 8bit Y, U, V arrays (U, V are None for GRAY)
+        '''
+        fmt = clip.format
+        if fmt.color_family not in (vs.YUV, vs.GRAY) or fmt.name.startswith('Compat'):
+            y, v, u = cv2.split(cv2.cvtColor(bgr, cv2.COLOR_BGR2YCrCb))
+            return y, u, v
+        f = clip.get_frame(n)
+        width, height, left, top = crop
+        def plane(p, sw=0, sh=0, chroma=False):
+            arr = np.asarray(f[p]) if isAPI4 else np.asarray(f.get_read_array(p))
+            arr = arr[top >> sh : (top+height) >> sh : max(1, step >> sh), left >> sw : (left+width) >> sw : max(1, step >> sw)]
+            if fmt.sample_type == vs.FLOAT:
+                return np.clip(((arr + 0.5) if chroma else arr)*255 + 0.5, 0, 255).astype(np.uint8)
+            return (arr >> (fmt.bits_per_sample - 8)).astype(np.uint8)
+        y = plane(0)
+        if fmt.color_family == vs.GRAY:
+            return y, None, None
+        sw, sh = fmt.subsampling_w, fmt.subsampling_h
+        return y, plane(1, sw, sh, True), plane(2, sw, sh, True)
+
+    def waveform(self, values, columns):
+        '''
+        2D histogram of values (rows, 255 on top) in columns of image
+        '''
+        values = cv2.resize(values, (columns, values.shape[0]), interpolation=cv2.INTER_NEAREST)
+        index = np.tile(np.arange(columns, dtype=np.uint8), (values.shape[0], 1))
+        hist = cv2.calcHist([values, index], [0, 1], None, [256, columns], [0, 256, 0, columns])
+        return self.intensity(hist[::-1])
+
+    def intensity(self, hist):
+        hist = np.log1p(hist)
+        peak = hist.max()
+        if peak > 0:
+            hist *= 255/peak
+        return hist.astype(np.uint8)
+
+    def work(self, clip, n, crop, step, bgr):
+        s = self.SIZE
+        canvas = np.zeros((2*s, 2*s, 3), np.uint8)
+        y, u, v = self.yuv(clip, n, crop, step, bgr)
+
+        hist = cv2.calcHist([y], [0], None, [s], [0, 256]).ravel()
+        tops = s - 1 - (hist * ((s-1)/max(hist.max(), 1))).astype(np.int32)
+        canvas[:s, :s] = (np.arange(s)[:, None] >= tops[None, :])[:, :, None] * 200
+
+        canvas[:s, s:] = self.waveform(y, s)[:, :, None]
+
+        third = s//3
+        for c in range(3):                                           #B,G,R planes, parade shows R,G,B from left
+            x = (2-c)*third
+            canvas[s:, x:x+third, c] = self.waveform(np.ascontiguousarray(bgr[:, :, c]), third)
+
+        if u is not None:
+            scope = self.intensity(cv2.calcHist([v, u], [0, 1], None, [s, s], [0, 256, 0, 256])[::-1])
+            canvas[s:, s:] = scope[:, :, None]
+            center = (s + s//2, s + s//2)
+            cv2.circle(canvas, center, s*7//16, (80, 80, 80), 1)
+            cv2.line(canvas, (s, center[1]), (2*s-1, center[1]), (80, 80, 80), 1)
+            cv2.line(canvas, (center[0], s), (center[0], 2*s-1), (80, 80, 80), 1)
+
+        for text, position in (('luma', (4, 14)), ('waveform', (s+4, 14)), ('RGB parade', (4, s+14)), ('vectorscope', (s+4, s+14))):
+            cv2.putText(canvas, text, position, cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 200, 255), 1, cv2.LINE_AA)
+        return canvas
+
+def psnr(a, b, peak=255):
+    '''
+    peak signal to noise ratio of two images in dB, inf if they are the same
+    '''
+    mse = np.mean((a.astype(np.float32) - b.astype(np.float32))**2, dtype=np.float64)
+    return float('inf') if mse == 0 else float(10*np.log10(peak*peak/mse))
+
+
+def ssim(a, b, peak=255):
+    '''
+    mean structural similarity of two single plane images, gaussian window 11x11 sigma 1.5 as in original SSIM paper,
+    opencv filters release GIL, so it runs in parallel with other threads
+    '''
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    c1 = (0.01*peak)**2
+    c2 = (0.03*peak)**2
+    blur = lambda x: cv2.GaussianBlur(x, (11, 11), 1.5)
+    mu_a, mu_b = blur(a), blur(b)
+    mu_aa, mu_bb, mu_ab = mu_a*mu_a, mu_b*mu_b, mu_a*mu_b
+    var_a = blur(a*a) - mu_aa
+    var_b = blur(b*b) - mu_bb
+    cov = blur(a*b) - mu_ab
+    ssim_map = ((2*mu_ab + c1)*(2*cov + c2)) / ((mu_aa + mu_bb + c1)*(var_a + var_b + c2))
+    return float(ssim_map.mean(dtype=np.float64))
+
+
+def plane_metrics(a, b, peak):
+    '''
+    returns PSNR, SSIM and max absolute difference of two planes
+    '''
+    max_diff = np.abs(a.astype(np.float32) - b.astype(np.float32)).max()
+    max_diff = float(max_diff) if a.dtype.kind == 'f' else int(max_diff)
+    return psnr(a, b, peak), ssim(a, b, peak), max_diff
+
+
+class FrameMetrics(BackgroundWorker):
+    '''
+    PSNR and SSIM of two rendered BGR images in a background thread, SSIM is computed for luma (gray) only
+    '''
+    def work(self, a, b):
+        gray = lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return psnr(a, b), ssim(gray(a), gray(b))
+
+
         
                 
 if __name__ == '__main__':